@@ -138,8 +138,8 @@ class KlippyGtk:
             logging.error(f"Unable to find image {filename}")
             return None
 
-    def PixbufFromHttp(self, resource, width=-1, height=-1):
-        response = self.screen.apiclient.get_thumbnail_stream(resource)
+    @staticmethod
+    def PixbufFromBytes(response, width=-1, height=-1):
         if response is False:
             return None
         stream = Gio.MemoryInputStream.new_from_data(response, None)
@@ -148,7 +148,7 @@ class KlippyGtk:
         except Exception as e:
             logging.exception(e)
             return None
-        stream.close_async(2)
+        stream.close()
         return pixbuf
 
     def Button(self, image_name=None, label=None, style=None, scale=None, position=Gtk.PositionType.TOP, lines=2):
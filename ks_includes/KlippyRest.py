@@ -1,14 +1,48 @@
 import logging
 import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
 import requests
+from requests.adapters import HTTPAdapter
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+from ks_includes import json_codec
+from ks_includes.profiler import profiler
 
 
 class KlippyRest:
+    max_workers = 4
+
     def __init__(self, ip, port=7125, api_key=False):
         self.ip = ip
         self.port = port
         self.api_key = api_key
         self.status = ''
+        # Sessions aren't thread safe, each thread keeps its own keep-alive connection
+        self.local = threading.local()
+        self.sessions = []
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="KlippyRest")
+        self.closed = False
+
+    @property
+    def session(self):
+        session = getattr(self.local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.mount("http://", HTTPAdapter(pool_maxsize=1))
+            session.mount("https://", HTTPAdapter(pool_maxsize=1))
+            if self.api_key is not False:
+                session.headers.update({"x-api-key": self.api_key})
+            self.local.session = session
+            with self.lock:
+                self.sessions.append(session)
+        return session
 
     @property
     def endpoint(self):
@@ -32,34 +66,89 @@ class KlippyRest:
     def get_thumbnail_stream(self, thumbnail):
         return self.send_request(f"server/files/gcodes/{thumbnail}", json=False)
 
+    def close(self):
+        self.closed = True
+        self.pool.shutdown(wait=False)
+        with self.lock:
+            for session in self.sessions:
+                session.close()
+            self.sessions = []
+
+    def send_request_async(self, method, callback=None, *args, json=True):
+        """
+        Sends the request from the worker pool without blocking, returns a Future
+
+        The callback receives the result and args in the main loop
+        """
+        if self.closed:
+            return None
+        future = self.pool.submit(self.send_request, method, json)
+        if callback is not None:
+            future.add_done_callback(lambda f: GLib.idle_add(self._run_callback, callback, f.result(), *args))
+        return future
+
+    def send_requests_async(self, methods, callback=None, *args):
+        """
+        Sends independent requests concurrently without blocking, returns their Futures
+
+        The callback receives the list of results in the same order and args in the main loop
+        """
+        if self.closed:
+            return []
+        futures = [self.pool.submit(self.send_request, method) for method in methods]
+        if callback is not None:
+            pending = set(futures)
+            lock = threading.Lock()
+
+            def done(future):
+                with lock:
+                    pending.discard(future)
+                    if pending:
+                        return
+                GLib.idle_add(self._run_callback, callback, [f.result() for f in futures], *args)
+
+            for future in futures:
+                future.add_done_callback(done)
+        return futures
+
+    def _run_callback(self, callback, result, *args):
+        # Results for a client that was replaced are discarded
+        if not self.closed:
+            callback(result, *args)
+        return False
+
     def send_request(self, method, json=True):
         url = f"{self.endpoint}/{method}"
-        headers = {} if self.api_key is False else {"x-api-key": self.api_key}
         data = False
+        status = ''
+        start = time.monotonic()
         try:
-            response = requests.get(url, headers=headers, timeout=3)
+            response = self.session.get(url, timeout=3)
             response.raise_for_status()
             if json:
                 logging.debug(f"Sending request to {url}")
-                data = response.json()
+                data = json_codec.loads(response.content)
             else:
                 data = response.content
         except requests.exceptions.HTTPError as h:
-            self.status = self.format_status(h)
+            status = self.format_status(h)
         except requests.exceptions.ConnectionError as c:
-            self.status = self.format_status(c)
+            status = self.format_status(c)
         except requests.exceptions.Timeout as t:
-            self.status = self.format_status(t)
-        except requests.exceptions.JSONDecodeError as j:
-            self.status = self.format_status(j)
+            status = self.format_status(t)
+        except ValueError as j:
+            # JSONDecodeError of every codec is a ValueError
+            status = self.format_status(j)
         except requests.exceptions.RequestException as r:
-            self.status = self.format_status(r)
+            status = self.format_status(r)
         except Exception as e:
-            self.status = self.format_status(e)
-        if data:
-            self.status = ''
-        else:
-            logging.error(self.status.replace('\n', '>>'))
+            status = self.format_status(e)
+        profiler.add(f"GET /{method}", "rest", start, ok=bool(data))
+        if not data:
+            logging.error(status.replace('\n', '>>'))
+        # Requests finish in the worker threads
+        with self.lock:
+            self.status = status
         return data
 
     @staticmethod
@@ -3,22 +3,54 @@
 import threading
 import json
 import logging
+import time
+from collections import deque
+from concurrent.futures import Future
 
 import gi
 import websocket
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import GLib
+from ks_includes import json_codec
 from ks_includes.KlippyGcodes import KlippyGcodes
+from ks_includes.profiler import profiler
 
 
 class KlippyWebsocket(threading.Thread):
     _req_id = 0
     connected = False
     connecting = True
-    callback_table = {}
     reconnect_count = 0
     max_retries = 4
+    # Read-only methods, identical requests in flight share the same response
+    coalesced_methods = {
+        "machine.device_power.devices",
+        "printer.info",
+        "printer.objects.query",
+        "server.config",
+        "server.files.list",
+        "server.files.metadata",
+        "server.info",
+        "server.temperature_store",
+    }
+    # Bulk methods and the number of requests of each that can be in flight
+    bulk_methods = {
+        "server.files.metadata": 4,
+    }
+    # Seconds to wait for a response, None waits until the connection is lost
+    request_timeout = 30
+    method_timeouts = {
+        "machine.update.client": None,
+        "machine.update.full": None,
+        "machine.update.klipper": None,
+        "machine.update.moonraker": None,
+        "machine.update.recover": None,
+        "machine.update.system": None,
+        "printer.gcode.script": None,
+    }
+    # Slots of one second in the timer wheel used for the deadlines
+    wheel_size = 64
 
     def __init__(self, screen, callback, host, port):
         threading.Thread.__init__(self)
@@ -29,8 +61,21 @@ class KlippyWebsocket(threading.Thread):
         self.klippy = MoonrakerApi(self)
         self.ws = None
         self.closing = False
+        self.reconnect_timeout = None
         self.host = host
         self.port = port
+        self.lock = threading.Lock()
+        self.callback_table = {}
+        self.wheel = [set() for _ in range(self.wheel_size)]
+        self.wheel_pos = 0
+        self.wheel_timeout = None
+        self.coalesced = {}
+        self.bulk_queue = {method: deque() for method in self.bulk_methods}
+        self.bulk_in_flight = {method: 0 for method in self.bulk_methods}
+
+    @property
+    def outstanding(self):
+        return len(self.callback_table)
 
     @property
     def _url(self):
@@ -48,10 +93,17 @@ class KlippyWebsocket(threading.Thread):
         self.initial_connect()
 
     def initial_connect(self):
-        if self.connect() is not False:
-            GLib.timeout_add_seconds(10, self.reconnect)
+        if self.reconnect_timeout is not None:
+            GLib.source_remove(self.reconnect_timeout)
+            self.reconnect_timeout = None
+        self.connect()
+
+    def schedule_reconnect(self):
+        if self.reconnect_timeout is None:
+            self.reconnect_timeout = GLib.timeout_add_seconds(10, self.reconnect)
 
     def reconnect(self):
+        self.reconnect_timeout = None
         if self.reconnect_count > self.max_retries:
             logging.debug("Stopping reconnections")
             self.connecting = False
@@ -59,30 +111,33 @@ class KlippyWebsocket(threading.Thread):
                 _("Cannot connect to Moonraker")
                 + f'\n\n{self._screen.apiclient.status}')
             return False
-        return self.connect()
+        self.connect()
+        return False
 
     def connect(self):
         if self.connected:
             logging.debug("Already connected")
-            return False
+            return
         logging.debug("Attempting to connect")
         self.reconnect_count += 1
-        try:
-            state = self._screen.apiclient.get_server_info()
-            if state is False:
-                if self.reconnect_count > 2:
-                    self._screen.printer_initializing(
-                        _("Cannot connect to Moonraker") + '\n\n'
-                        + _("Retrying") + f' #{self.reconnect_count}'
-                    )
-                return True
-            token = self._screen.apiclient.get_oneshot_token()
-        except Exception as e:
-            logging.critical(e, exc_info=True)
+        self._screen.apiclient.send_requests_async(("server/info", "access/oneshot_token"), self.on_server_info)
+
+    def on_server_info(self, results):
+        state, token = results
+        if state is False:
+            if self.reconnect_count > 2:
+                self._screen.printer_initializing(
+                    _("Cannot connect to Moonraker") + '\n\n'
+                    + _("Retrying") + f' #{self.reconnect_count}'
+                )
+            self.schedule_reconnect()
+            return
+        if token is False or 'result' not in token:
             logging.debug("Unable to get oneshot token")
-            return True
+            self.schedule_reconnect()
+            return
 
-        self.ws_url = f"{self.ws_proto}://{self._url}/websocket?token={token}"
+        self.ws_url = f"{self.ws_proto}://{self._url}/websocket?token={token['result']}"
         self.ws = websocket.WebSocketApp(
             self.ws_url,
             on_close=self.on_close, on_error=self.on_error, on_message=self.on_message, on_open=self.on_open
@@ -94,50 +149,222 @@ class KlippyWebsocket(threading.Thread):
         except Exception as e:
             logging.critical(e, exc_info=True)
             logging.debug("Error starting web socket")
-            return True
-        return False
+            self.schedule_reconnect()
 
     def close(self):
         self.closing = True
         self.connecting = False
+        if self.wheel_timeout is not None:
+            GLib.source_remove(self.wheel_timeout)
+            self.wheel_timeout = None
+        if self.reconnect_timeout is not None:
+            GLib.source_remove(self.reconnect_timeout)
+            self.reconnect_timeout = None
+        self.fail_requests("Connection closed")
         if self.ws is not None:
             self.ws.close()
 
     def on_message(self, *args):
         message = args[1] if len(args) == 2 else args[0]
-        response = json.loads(message)
-        if "id" in response and response['id'] in self.callback_table:
-            args = (response,
-                    self.callback_table[response['id']][1],
-                    self.callback_table[response['id']][2],
-                    *self.callback_table[response['id']][3])
-            GLib.idle_add(self.callback_table[response['id']][0], *args)
-            self.callback_table.pop(response['id'])
+        response = json_codec.loads(message)
+        if isinstance(response, list):
+            # Response to a batch
+            for item in response:
+                self.process_response(item)
+        else:
+            self.process_response(response)
+        self.send_bulk()
+
+    def process_response(self, response):
+        if "id" in response:
+            request = self.pop_request(response['id'])
+            if request is not None:
+                self.resolve(request, response)
             return
 
         if "method" in response and "on_message" in self._callback:
             args = response['method'], response['params'][0] if "params" in response else {}
+            if response['method'] == "notify_status_update" and "on_status_update" in self._callback:
+                # Handled in this thread to keep the parsing and merging out of the main loop
+                self._callback['on_status_update'](args[1])
+                return
             GLib.idle_add(self._callback['on_message'], *args)
         return
 
-    def send_method(self, method, params=None, callback=None, *args):
+    def pop_request(self, req_id):
+        with self.lock:
+            request = self.callback_table.pop(req_id, None)
+            if request is None:
+                return None
+            if self.coalesced.get(request['key']) == req_id:
+                del self.coalesced[request['key']]
+            if request['method'] in self.bulk_in_flight:
+                self.bulk_in_flight[request['method']] -= 1
+        return request
+
+    def expire_requests(self):
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            self.wheel_pos = (self.wheel_pos + 1) % self.wheel_size
+            slot = self.wheel[self.wheel_pos]
+            for req_id in list(slot):
+                request = self.callback_table.get(req_id)
+                if request is None:
+                    slot.discard(req_id)
+                elif request['deadline'] <= now:
+                    slot.discard(req_id)
+                    expired.append(req_id)
+        for req_id in expired:
+            request = self.pop_request(req_id)
+            if request is None:
+                continue
+            logging.debug(f"Request {req_id} {request['method']} timed out, {self.outstanding} outstanding")
+            self.resolve(request, self.error_response(req_id, "Request timed out"), False)
+        if expired:
+            self.send_bulk()
+        return True
+
+    def fail_requests(self, message):
+        with self.lock:
+            requests, self.callback_table = self.callback_table, {}
+            self.coalesced.clear()
+            for method in self.bulk_methods:
+                self.bulk_queue[method].clear()
+                self.bulk_in_flight[method] = 0
+            for slot in self.wheel:
+                slot.clear()
+        if requests:
+            logging.debug(f"Dropping {len(requests)} outstanding requests: {message}")
+        for req_id, request in requests.items():
+            self.resolve(request, self.error_response(req_id, message), False)
+
+    @staticmethod
+    def error_response(req_id, message):
+        return {"jsonrpc": "2.0", "error": {"code": -32000, "message": message}, "id": req_id}
+
+    @staticmethod
+    def resolve(request, response, callbacks=True):
+        # Responses made up for failed requests only complete the future and the handlers,
+        # the callbacks expect a result from Moonraker
+        profiler.add(request['method'], "websocket", request['sent'], error="error" in response)
+        for handler in request['handlers']:
+            handler(response)
+        request['future'].set_result(response)
+        if not callbacks:
+            return
+        for callback, args in request['callbacks']:
+            GLib.idle_add(callback, response, request['method'], request['params'], *args)
+
+    def send_bulk(self):
+        messages = []
+        with self.lock:
+            for method, queue in self.bulk_queue.items():
+                while queue and self.bulk_in_flight[method] < self.bulk_methods[method]:
+                    messages.append(queue.popleft())
+                    self.bulk_in_flight[method] += 1
+        if not messages:
+            return
+        if self.connected:
+            try:
+                self.ws.send(json_codec.dumps(messages[0] if len(messages) == 1 else messages))
+                return
+            except websocket.WebSocketException as e:
+                logging.debug(f"Unable to send {len(messages)} queued requests: {e}")
+        for data in messages:
+            request = self.pop_request(data['id'])
+            if request is not None:
+                self.resolve(request, self.error_response(data['id'], "Not connected to Moonraker"), False)
+
+    def send_method(self, method, params=None, callback=None, *args, timeout=0, handler=None):
+        """
+        Sends a JSON-RPC request, returns a Future that receives the response or False if not connected
+
+        Identical requests to read-only methods that are still in flight are not sent again,
+        bulk methods are queued and sent as the previous ones complete.
+        Requests without a response after timeout seconds (the method default if 0) or dropped when the
+        connection is lost complete the Future and the handler with an error response, the callback is not called.
+        The handler receives the response in the websocket thread, before any message that follows it
+        """
         if not self.connected:
             return False
         if params is None:
             params = {}
-
-        self._req_id += 1
-        if callback is not None:
-            self.callback_table[self._req_id] = [callback, method, params, [*args]]
-
-        data = {
-            "jsonrpc": "2.0",
-            "method": method,
-            "params": params,
-            "id": self._req_id
-        }
-        self.ws.send(json.dumps(data))
-        return True
+        if timeout == 0:
+            timeout = self.method_timeouts.get(method, self.request_timeout)
+
+        with self.lock:
+            key = None
+            if method in self.coalesced_methods:
+                key = (method, json.dumps(params, sort_keys=True))
+                if self.coalesced.get(key) in self.callback_table:
+                    request = self.callback_table[self.coalesced[key]]
+                    if callback is not None:
+                        request['callbacks'].append((callback, args))
+                    if handler is not None:
+                        request['handlers'].append(handler)
+                    return request['future']
+
+            self._req_id += 1
+            request = {
+                "method": method,
+                "params": params,
+                "callbacks": [] if callback is None else [(callback, args)],
+                "handlers": [] if handler is None else [handler],
+                "future": Future(),
+                "key": key,
+                "deadline": None,
+                "sent": time.monotonic(),
+            }
+            self.callback_table[self._req_id] = request
+            if timeout is not None:
+                request['deadline'] = time.monotonic() + timeout
+                # Requests longer than the wheel are checked again on each turn
+                slot = (self.wheel_pos + min(int(timeout) + 1, self.wheel_size - 1)) % self.wheel_size
+                self.wheel[slot].add(self._req_id)
+            if key is not None:
+                self.coalesced[key] = self._req_id
+
+            data = {
+                "jsonrpc": "2.0",
+                "method": method,
+                "params": params,
+                "id": self._req_id
+            }
+            if method in self.bulk_methods:
+                if self.bulk_in_flight[method] >= self.bulk_methods[method]:
+                    self.bulk_queue[method].append(data)
+                    return request['future']
+                self.bulk_in_flight[method] += 1
+        self.ws.send(json_codec.dumps(data))
+        return request['future']
+
+    def send_methods(self, requests, callback, *args):
+        """
+        Sends the (method, params) requests pipelined, without waiting for each response
+
+        The callback receives the list of responses in the same order and args in the main loop,
+        False in place of every response if not connected
+        """
+        futures = [self.send_method(method, params) for method, params in requests]
+        if False in futures:
+            GLib.idle_add(callback, [False] * len(futures), *args)
+            return
+        pending = set(futures)
+        lock = threading.Lock()
+
+        def done(future):
+            with lock:
+                # Coalesced requests share a future
+                if future not in pending:
+                    return
+                pending.discard(future)
+                if pending:
+                    return
+            GLib.idle_add(callback, [f.result() for f in futures], *args)
+
+        for future in futures:
+            future.add_done_callback(done)
 
     def on_open(self, *args):
         logging.info("Moonraker Websocket Open")
@@ -145,6 +372,9 @@ class KlippyWebsocket(threading.Thread):
         self.connecting = False
         self._screen.reinit_count = 0
         self.reconnect_count = 0
+        self.fail_requests("Reconnected to Moonraker")
+        if self.wheel_timeout is None:
+            self.wheel_timeout = GLib.timeout_add_seconds(1, self.expire_requests)
         if "on_connect" in self._callback:
             GLib.idle_add(self._callback['on_connect'])
 
@@ -167,6 +397,7 @@ class KlippyWebsocket(threading.Thread):
             GLib.idle_add(self._callback['on_close'], "Lost Connection to Moonraker")
         logging.info("Moonraker Websocket Closed")
         self.connected = False
+        self.fail_requests("Lost Connection to Moonraker")
 
     @staticmethod
     def on_error(*args):
@@ -219,11 +450,14 @@ class MoonrakerApi:
             *args
         )
 
-    def object_subscription(self, updates):
+    def object_subscription(self, updates, callback=None, *args, handler=None):
         logging.debug("Sending printer.objects.subscribe")
         return self._ws.send_method(
             "printer.objects.subscribe",
-            updates
+            updates,
+            callback,
+            *args,
+            handler=handler
         )
 
     def power_device_off(self, device, callback=None, *args):
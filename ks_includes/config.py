@@ -110,10 +110,9 @@ class KlipperScreenConfig:
 
     def create_translations(self):
         lang_path = os.path.join(klipperscreendir, "ks_includes", "locales")
+        # Only the directory names are read here, catalogs are loaded when a language is installed
         self.lang_list = [d for d in os.listdir(lang_path) if not os.path.isfile(os.path.join(lang_path, d))]
         self.lang_list.sort()
-        for lng in self.lang_list:
-            self.langs[lng] = gettext.translation('KlipperScreen', localedir=lang_path, languages=[lng], fallback=True)
 
         lang = self.get_main_config().get("language", None)
         logging.debug(f"Selected lang: {lang} OS lang: {locale.getlocale()[0]}")
@@ -136,6 +135,11 @@ class KlipperScreenConfig:
             logging.info(f"Available lang list {self.lang_list}")
             lang = "en"
         logging.info(f"Using lang {lang}")
+        if lang not in self.langs:
+            lang_path = os.path.join(klipperscreendir, "ks_includes", "locales")
+            self.langs[lang] = gettext.translation(
+                'KlipperScreen', localedir=lang_path, languages=[lang], fallback=True
+            )
         self.lang = self.langs[lang]
         self.lang.install(names=['gettext', 'ngettext'])
 
@@ -158,7 +162,7 @@ class KlipperScreenConfig:
                 )
                 numbers = (
                     'job_complete_timeout', 'job_error_timeout', 'move_speed_xy', 'move_speed_z',
-                    'print_estimate_compensation', 'width', 'height',
+                    'print_estimate_compensation', 'width', 'height', 'status_update_rate', 'preload_panels',
                 )
             elif section.startswith('printer '):
                 bools = (
@@ -11,12 +11,12 @@ class KlippyFiles:
     def __init__(self, screen):
         self._screen = screen
         self.callbacks = []
+        # Indexed by path, holds the size and modified stamps used to sync the list
         self.files = {}
-        self.filelist = []
         self.gcodes_path = None
 
     def initialize(self):
-        if "virtual_sdcard" in self._screen.printer.get_config_section_list():
+        if self._screen.printer.config_section_exists("virtual_sdcard"):
             vsd = self._screen.printer.get_config_section("virtual_sdcard")
             if "path" in vsd:
                 self.gcodes_path = os.path.expanduser(vsd['path'])
@@ -26,28 +26,18 @@ class KlippyFiles:
         self._screen = None
         self.callbacks = None
         self.files = None
-        self.filelist = None
         self.gcodes_path = None
 
     def _callback(self, result, method, params):
         if method == "server.files.list":
             if "result" in result and isinstance(result['result'], list):
-                newfiles = []
-                deletedfiles = self.filelist.copy()
-                for item in result['result']:
-                    file = item['filename'] if "filename" in item else item['path']
-                    if file in self.files:
-                        deletedfiles.remove(file)
-                    else:
-                        newfiles.append(file)
-                        self.add_file(item, False)
-
-                if newfiles or len(deletedfiles) > 0:
+                newfiles, deletedfiles, updatedfiles = self.sync_files(result['result'])
+                for file in deletedfiles:
+                    self.remove_file(file, False)
+                for file in updatedfiles:
+                    self.request_metadata(file)
+                if newfiles or deletedfiles:
                     self.run_callbacks(newfiles, deletedfiles)
-
-                if len(deletedfiles) > 0:
-                    for file in deletedfiles:
-                        self.remove_file(file)
         elif method == "server.files.directory":
             if "result" in result:
                 directory = params['path'][7:] if params['path'].startswith('gcodes/') else params['path']
@@ -57,7 +47,7 @@ class KlippyFiles:
                 newfiles = []
                 for file in result['result']['files']:
                     fullpath = f"{directory}/{file['filename']}"
-                    if fullpath not in self.filelist:
+                    if fullpath not in self.files:
                         newfiles.append(fullpath)
 
                 if newfiles:
@@ -86,20 +76,41 @@ class KlippyFiles:
                         thumbnail['path'] = os.path.join(fdir, thumbnail['relative_path'])
             self.run_callbacks(mods=[params['filename']])
 
+    def sync_files(self, items):
+        """
+        Adds the new files of a full listing and updates the stamps of the modified ones
+
+        Returns the new, deleted and modified paths, the deleted ones are not removed
+        """
+        newfiles = []
+        updatedfiles = []
+        listed = set()
+        for item in items:
+            file = item['path'] if "path" in item else item['filename']
+            listed.add(file)
+            if file not in self.files:
+                newfiles.append(file)
+                self.add_file(item, False)
+            elif (item['modified'], item['size']) != (self.files[file]['modified'], self.files[file]['size']):
+                updatedfiles.append(file)
+                self.files[file]['modified'] = item['modified']
+                self.files[file]['size'] = item['size']
+        deletedfiles = [file for file in self.files if file not in listed]
+        return newfiles, deletedfiles, updatedfiles
+
     def add_file(self, item, notify=True):
         if 'filename' not in item and 'path' not in item:
             logging.info(f"Error adding item, unknown filename or path: {item}")
             return
 
         filename = item['path'] if "path" in item else item['filename']
-        if filename in self.filelist:
+        if filename in self.files:
             logging.info(f"File already exists: {filename}")
             self.request_metadata(filename)
             args = None, None, [filename]
             GLib.idle_add(self.run_callbacks, *args)
             return
 
-        self.filelist.append(filename)
         self.files[filename] = {
             "size": item['size'],
             "modified": item['modified']
@@ -137,7 +148,7 @@ class KlippyFiles:
             self.callbacks.pop(self.callbacks.index(callback))
 
     def file_exists(self, filename):
-        return filename in self.filelist
+        return filename in self.files
 
     def file_metadata_exists(self, filename):
         if self.file_exists(filename):
@@ -160,7 +171,7 @@ class KlippyFiles:
         return "thumbnails" in self.files[filename] and len(self.files[filename]) > 0
 
     def request_metadata(self, filename):
-        if filename not in self.filelist:
+        if filename not in self.files:
             return False
         self._screen._ws.klippy.get_file_metadata(filename, self._callback)
 
@@ -169,11 +180,10 @@ class KlippyFiles:
         return False
 
     def remove_file(self, filename, notify=True):
-        if filename not in self.filelist:
+        if filename not in self.files:
             return
 
-        self.filelist.remove(filename)
-        self.files.pop(filename, None)
+        self.files.pop(filename)
 
         if notify is True:
             self.run_callbacks(deletedfiles=[filename])
@@ -193,7 +203,7 @@ class KlippyFiles:
         return False
 
     def get_file_list(self):
-        return self.filelist
+        return list(self.files)
 
     def get_file_info(self, filename):
         if filename not in self.files:
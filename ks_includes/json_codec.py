@@ -0,0 +1,43 @@
+"""
+JSON encoding and decoding for the Moonraker connections
+
+Uses orjson or ujson when installed, falling back to the standard library.
+Documents they reject, like the NaN and Infinity values accepted by the standard library, are decoded by it
+"""
+import json
+
+try:
+    import orjson
+
+    NAME = "orjson"
+
+    def loads(data):
+        try:
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            return json.loads(data)
+
+    def dumps(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    try:
+        import ujson
+
+        NAME = "ujson"
+
+        def loads(data):
+            try:
+                return ujson.loads(data)
+            except ValueError:
+                return json.loads(data)
+
+        def dumps(obj):
+            return ujson.dumps(obj, ensure_ascii=False)
+    except ImportError:
+        NAME = "json"
+
+        def loads(data):
+            return json.loads(data)
+
+        def dumps(obj):
+            return json.dumps(obj)
@@ -0,0 +1,105 @@
+import logging
+from collections import OrderedDict
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+
+class PanelPreloader:
+    """
+    Builds the panels that are likely to be opened next while the printer is idle
+
+    One panel is built per idle callback, so user input is not delayed.
+    At most max_panels instances are kept, the least recently requested are dropped first.
+    """
+
+    # Panels with side effects when they are created
+    excluded = {"bed_level", "network"}
+
+    def __init__(self, screen, max_panels=3):
+        self._screen = screen
+        self.max_panels = max_panels
+        self.pool = OrderedDict()
+        self.queue = []
+        self.idle_id = None
+
+    def schedule(self):
+        if self.max_panels <= 0:
+            return
+        candidates = [("job_status", "job_status", _("Printing"))]
+        printer = self._screen.printer.get_printer_status_data()
+        for item in self._screen._config.get_menu_items("__main"):
+            item = next(iter(item.values()))
+            if item['panel'] is None or item['panel'] in self.excluded:
+                continue
+            if not self._screen.base_panel.evaluate_enable(item['enable']):
+                continue
+            try:
+                panel_name = self._screen.get_template(item['panel']).render(printer)
+            except Exception as e:
+                logging.debug(f"Not preloading {item['panel']}: {e}")
+                continue
+            candidates.append((panel_name, item['panel'], item['name']))
+        self.queue = []
+        for candidate in candidates[:self.max_panels]:
+            if candidate[0] in self.pool:
+                self.pool.move_to_end(candidate[0])
+            elif candidate[0] not in self._screen.panels:
+                self.queue.append(candidate)
+        if self.queue and self.idle_id is None:
+            self.idle_id = GLib.idle_add(self._preload_next, priority=GLib.PRIORITY_LOW)
+
+    def _preload_next(self):
+        if not self.queue or not self._screen.initialized or self._screen.printer.state != "ready":
+            self.idle_id = None
+            return False
+        panel_name, panel_type, title = self.queue.pop(0)
+        if panel_name not in self.pool and panel_name not in self._screen.panels:
+            try:
+                self.pool[panel_name] = panel_type, self._screen._load_panel(panel_type, self._screen, title)
+                logging.debug(f"Preloaded panel: {panel_name}")
+            except Exception as e:
+                logging.debug(f"Unable to preload {panel_name}: {e}")
+            while len(self.pool) > self.max_panels:
+                evicted, (_type, panel) = self.pool.popitem(last=False)
+                self.discard(panel)
+                logging.debug(f"Dropped preloaded panel: {evicted}")
+        if self.queue:
+            return True
+        self.idle_id = None
+        return False
+
+    def take(self, panel_name, panel_type, kwargs):
+        # Panels created with arguments are built on demand
+        if kwargs or panel_name not in self.pool:
+            return None
+        pooled_type, panel = self.pool.pop(panel_name)
+        return panel if pooled_type == panel_type else None
+
+    def clear(self):
+        if self.idle_id is not None:
+            GLib.source_remove(self.idle_id)
+            self.idle_id = None
+        self.queue = []
+        for _type, panel in self.pool.values():
+            self.discard(panel)
+        self.pool.clear()
+
+    def discard(self, panel):
+        # Undoes what the panel registered, as when the screen removes a panel
+        if hasattr(panel, "deactivate"):
+            panel.deactivate()
+        files, printer = self._screen.files, self._screen.printer
+        if files is not None and files.callbacks:
+            for callback in list(files.callbacks):
+                if getattr(callback, "__self__", None) is panel:
+                    files.remove_file_callback(callback)
+        if printer is not None:
+            for callbacks in list(printer.listeners.values()):
+                for callback in list(callbacks):
+                    if getattr(callback, "__self__", None) is panel:
+                        printer.remove_listener(callback)
+        self._screen.thumbnail_loader.cancel(panel)
+        panel.content.destroy()
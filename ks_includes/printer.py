@@ -1,14 +1,56 @@
 import logging
 import contextlib
+import threading
+from array import array
 import gi
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import GLib
 
 
+class TempStoreSeries:
+    """
+    Fixed size ring buffer of float32 samples
+
+    Every sample is written twice, so the last 'size' samples are always contiguous
+    and windows of them can be returned as memoryviews without copying
+    """
+
+    def __init__(self, size, values=()):
+        self.size = max(int(size), 1)
+        self.buffer = array('f', bytes(8 * self.size))
+        self.head = 0
+        # Total number of samples appended, used to address samples independently of the head
+        self.count = 0
+        for value in list(values)[-self.size:]:
+            self.append(value)
+
+    def append(self, value):
+        self.buffer[self.head] = self.buffer[self.head + self.size] = value
+        self.head = (self.head + 1) % self.size
+        self.count += 1
+
+    def view(self, results=0):
+        start = self.head + self.size - results if 0 < results < self.size else self.head
+        return memoryview(self.buffer)[start:self.head + self.size]
+
+    def extrema(self, start, end):
+        # min and max of the stored samples numbered from start to end (not included)
+        offset = self.count - self.size
+        window = self.view()[max(start - offset, 0):max(end - offset, 0)]
+        return (min(window), max(window)) if len(window) else None
+
+    def __len__(self):
+        return self.size
+
+
 class Printer:
     def __init__(self, state_cb, state_callbacks, busy_cb):
         self.config = {}
+        self.section_names = set()
+        self.section_types = {}
+        self.status_data = None
+        self.status_data_version = 0
         self.data = {}
         self.state = "disconnected"
         self.state_cb = state_cb
@@ -27,75 +69,81 @@ class Printer:
         self.busy_cb = busy_cb
         self.busy = False
         self.tempstore_size = 1200
+        self.lock = threading.RLock()
+        self.listeners = {}
 
     def reinit(self, printer_info, data):
-        self.config = data['configfile']['config']
-        self.data = data
-        self.devices = {}
-        self.tools = []
-        self.scales = []
-        self.extrudercount = 0
-        self.tempdevcount = 0
-        self.scaledevcount = 0
-        self.fancount = 0
-        self.output_pin_count = 0
-        self.tempstore = {}
-        self.busy = False
-        if not self.store_timeout:
-            self.store_timeout = GLib.timeout_add_seconds(1, self._update_temp_store)
-        self.tempstore_size = 1200
-
-        for x in self.config.keys():
-            if x[:8] == "extruder":
-                self.tools.append(x)
-                self.tools = sorted(self.tools)
-                self.extrudercount += 1
-                if x.startswith('extruder_stepper'):
-                    continue
-                self.devices[x] = {
-                    "temperature": 0,
-                    "target": 0
-                }
-            if x == 'heater_bed' \
-                    or x.startswith('heater_generic ') \
-                    or x.startswith('temperature_sensor ') \
-                    or x.startswith('temperature_fan '):
-                self.devices[x] = {"temperature": 0}
-                if not x.startswith('temperature_sensor '):
-                    self.devices[x]["target"] = 0
-                # Support for hiding devices by name
-                name = x.split()[1] if len(x.split()) > 1 else x
-                if not name.startswith("_"):
-                    self.tempdevcount += 1
-            if x == 'fan' \
-                    or x.startswith('controller_fan ') \
-                    or x.startswith('heater_fan ') \
-                    or x.startswith('fan_generic '):
-                # Support for hiding devices by name
-                name = x.split()[1] if len(x.split()) > 1 else x
-                if not name.startswith("_"):
-                    self.fancount += 1
-            if x.startswith('output_pin ') and not x.split()[1].startswith("_"):
-                self.output_pin_count += 1
-            if x.startswith('bed_mesh '):
-                r = self.config[x]
-                r['x_count'] = int(r['x_count'])
-                r['y_count'] = int(r['y_count'])
-                r['max_x'] = float(r['max_x'])
-                r['min_x'] = float(r['min_x'])
-                r['max_y'] = float(r['max_y'])
-                r['min_y'] = float(r['min_y'])
-                r['points'] = [[float(j.strip()) for j in i.split(",")] for i in r['points'].strip().split("\n")]
-            if x.startswith('scale '):
-                self.scaledevcount += 1
-                self.scales.append(x)
-                self.devices[x] = {
-                    "weight": 0.,
-                    "tare": float(self.config[x].get('tare', 0.)),
-                    "diameter": float(self.config[x].get('diameter', 0.)),
-                    "density": float(self.config[x].get('density', 0.)),
-                }
-        self.process_update(data)
+        # process_update can be merging a delta in the websocket thread
+        with self.lock:
+            self.config = data['configfile']['config']
+            self.index_config_sections()
+            self.invalidate_status_data()
+            self.data = data
+            self.devices = {}
+            self.tools = []
+            self.scales = []
+            self.extrudercount = 0
+            self.tempdevcount = 0
+            self.scaledevcount = 0
+            self.fancount = 0
+            self.output_pin_count = 0
+            self.tempstore = {}
+            self.busy = False
+            if not self.store_timeout:
+                self.store_timeout = GLib.timeout_add_seconds(1, self._update_temp_store)
+            self.tempstore_size = 1200
+
+            for x in self.config.keys():
+                if x[:8] == "extruder":
+                    self.tools.append(x)
+                    self.tools = sorted(self.tools)
+                    self.extrudercount += 1
+                    if x.startswith('extruder_stepper'):
+                        continue
+                    self.devices[x] = {
+                        "temperature": 0,
+                        "target": 0
+                    }
+                if x == 'heater_bed' \
+                        or x.startswith('heater_generic ') \
+                        or x.startswith('temperature_sensor ') \
+                        or x.startswith('temperature_fan '):
+                    self.devices[x] = {"temperature": 0}
+                    if not x.startswith('temperature_sensor '):
+                        self.devices[x]["target"] = 0
+                    # Support for hiding devices by name
+                    name = x.split()[1] if len(x.split()) > 1 else x
+                    if not name.startswith("_"):
+                        self.tempdevcount += 1
+                if x == 'fan' \
+                        or x.startswith('controller_fan ') \
+                        or x.startswith('heater_fan ') \
+                        or x.startswith('fan_generic '):
+                    # Support for hiding devices by name
+                    name = x.split()[1] if len(x.split()) > 1 else x
+                    if not name.startswith("_"):
+                        self.fancount += 1
+                if x.startswith('output_pin ') and not x.split()[1].startswith("_"):
+                    self.output_pin_count += 1
+                if x.startswith('bed_mesh '):
+                    r = self.config[x]
+                    r['x_count'] = int(r['x_count'])
+                    r['y_count'] = int(r['y_count'])
+                    r['max_x'] = float(r['max_x'])
+                    r['min_x'] = float(r['min_x'])
+                    r['max_y'] = float(r['max_y'])
+                    r['min_y'] = float(r['min_y'])
+                    r['points'] = [[float(j.strip()) for j in i.split(",")] for i in r['points'].strip().split("\n")]
+                if x.startswith('scale '):
+                    self.scaledevcount += 1
+                    self.scales.append(x)
+                    self.devices[x] = {
+                        "weight": 0.,
+                        "tare": float(self.config[x].get('tare', 0.)),
+                        "diameter": float(self.config[x].get('diameter', 0.)),
+                        "density": float(self.config[x].get('density', 0.)),
+                    }
+            self.process_update(data)
 
         logging.info(f"Klipper version: {printer_info['software_version']}")
         logging.info(f"# Extruders: {self.extrudercount}")
@@ -106,22 +154,75 @@ class Printer:
         logging.info(f"# Devices: {self.devices}")
 
     def process_update(self, data):
-        if self.data is None:
-            return
-        for x in (self.get_tools() + self.get_heaters() + self.get_filament_sensors() + self.get_scales()):
-            if x in data:
-                for i in data[x]:
-                    self.set_dev_stat(x, i, data[x][i])
+        """
+        Merges a status delta into the printer model and returns the values that actually changed
 
-        for x in data:
-            if x == "configfile":
-                continue
-            if x not in self.data:
-                self.data[x] = {}
-            self.data[x].update(data[x])
+        This can run in the websocket thread: self.data is replaced instead of modified in place,
+        so the main loop always reads a consistent snapshot, and the state is evaluated in the main loop
+        """
+        if self.data is None:
+            return {}
+        changed = {}
+        with self.lock:
+            for x in data:
+                if x in self.devices:
+                    for i in data[x]:
+                        self.set_dev_stat(x, i, data[x][i])
+
+            new_data = dict(self.data)
+            for x in data:
+                if x == "configfile":
+                    continue
+                current = new_data.get(x, {})
+                diff = {k: v for k, v in data[x].items() if k not in current or current[k] != v}
+                if diff:
+                    new_data[x] = {**current, **diff}
+                    changed[x] = diff
+                elif x not in new_data:
+                    new_data[x] = {}
+            self.data = new_data
+            if "idle_timeout" in changed or "virtual_sdcard" in changed:
+                self.invalidate_status_data()
 
         if "webhooks" in data or "print_stats" in data or "idle_timeout" in data:
-            self.process_status_update()
+            # The state and its callbacks belong to the main loop
+            GLib.idle_add(self.process_status_update)
+        return changed
+
+    def add_listener(self, callback, *keys):
+        """
+        Calls callback(changes) from the main loop only when the value of one of the keys changes
+
+        keys are (object, field) tuples, use None as field to listen to every field of the object,
+        changes has the same layout as a status update but only includes the requested keys
+        """
+        for key in keys:
+            callbacks = self.listeners.setdefault(tuple(key), [])
+            if callback not in callbacks:
+                callbacks.append(callback)
+
+    def remove_listener(self, callback):
+        for key in list(self.listeners):
+            if callback in self.listeners[key]:
+                self.listeners[key].remove(callback)
+            if not self.listeners[key]:
+                del self.listeners[key]
+
+    def notify_listeners(self, data):
+        triggered = {}
+        for x in data:
+            for callback in self.listeners.get((x, None), ()):
+                triggered.setdefault(callback, {})[x] = data[x]
+            for i in data[x]:
+                for callback in self.listeners.get((x, i), ()):
+                    changes = triggered.setdefault(callback, {})
+                    if changes.get(x) is not data[x]:
+                        changes.setdefault(x, {})[i] = data[x][i]
+        for callback, changes in triggered.items():
+            try:
+                callback(changes)
+            except Exception as e:
+                logging.exception(f"Error in status listener {callback}:\n{e}")
 
     def evaluate_state(self):
         # webhooks states: startup, ready, shutdown, error
@@ -141,7 +242,8 @@ class Printer:
         state = self.evaluate_state()
         if state == "busy":
             self.busy = True
-            return GLib.idle_add(self.busy_cb, True)
+            GLib.idle_add(self.busy_cb, True)
+            return False
         if self.busy:
             self.busy = False
             GLib.idle_add(self.busy_cb, False)
@@ -159,6 +261,7 @@ class Printer:
         if state != self.state:
             logging.debug(f"Changing state from '{self.state}' to '{state}'")
             self.state = state
+            self.invalidate_status_data()
         if self.state_callbacks[state] is not None:
             logging.debug(f"Adding callback for state: {state}")
             GLib.idle_add(self.state_cb, self.state_callbacks[state])
@@ -172,11 +275,22 @@ class Printer:
                 "status": "on" if x['status'] == "on" else "off"
             }
         logging.debug(f"Power devices: {self.power_devices}")
+        self.invalidate_status_data()
+
+    def index_config_sections(self):
+        # Sections by type (the first word of the name), in config order
+        self.section_names = set(self.config)
+        self.section_types = {}
+        for section in self.config:
+            self.section_types.setdefault(section.split(" ", 1)[0], []).append(section)
 
     def get_config_section_list(self, search=""):
-        if self.config is not None:
-            return [i for i in list(self.config) if i.startswith(search)] if hasattr(self, "config") else []
-        return []
+        if not search:
+            return list(self.config)
+        section_type = search[:-1]
+        if search[-1] == " " and " " not in section_type:
+            return list(self.section_types.get(section_type, ()))
+        return [i for i in self.config if i.startswith(search)]
 
     def get_config_section(self, section):
         return self.config[section] if section in self.config else False
@@ -230,8 +344,21 @@ class Printer:
                 return self.get_config_section(probe_type)
         return None
 
+    def invalidate_status_data(self):
+        with self.lock:
+            self.status_data_version += 1
+            self.status_data = None
+
     def get_printer_status_data(self):
-        print(self.get_stat("virtual_sdcard").copy())
+        """
+        Returns the context of the menu templates, it's rebuilt only when the values it uses change
+
+        The returned dict is shared and must not be modified
+        """
+        status_data = self.status_data
+        if status_data is not None:
+            return status_data
+        version = self.status_data_version
         data = {
             "printer": {
                 "extruders": {"count": self.extrudercount},
@@ -256,6 +383,10 @@ class Printer:
         for section in sections:
             data["printer"][section] = self.config_section_exists(section)
 
+        with self.lock:
+            # Not stored if it was invalidated by the websocket thread while building it
+            if version == self.status_data_version:
+                self.status_data = data
         return data
 
     def get_power_devices(self):
@@ -316,16 +447,14 @@ class Printer:
         if section is not False:
             if section not in self.tempstore[device]:
                 return False
-            if results == 0 or results >= len(self.tempstore[device][section]):
-                return self.tempstore[device][section]
-            return self.tempstore[device][section][-results:]
+            return self.tempstore[device][section].view(results)
 
-        temp = {}
-        for section in self.tempstore[device]:
-            if results == 0 or results >= len(self.tempstore[device][section]):
-                temp[section] = self.tempstore[device][section]
-            temp[section] = self.tempstore[device][section][-results:]
-        return temp
+        return {section: self.tempstore[device][section].view(results) for section in self.tempstore[device]}
+
+    def get_temp_store_series(self, device, section):
+        if device not in self.tempstore or section not in self.tempstore[device]:
+            return None
+        return self.tempstore[device][section]
 
     def get_tools(self):
         return self.tools
@@ -346,37 +475,33 @@ class Printer:
     def init_temp_store(self, tempstore):
         if not tempstore or 'result' not in tempstore:
             return
-        if self.tempstore and list(self.tempstore) != list(tempstore['result']):
+        changed = self.tempstore and list(self.tempstore) != list(tempstore['result'])
+        self.tempstore = {
+            device: {
+                x: TempStoreSeries(self.tempstore_size, values)
+                for x, values in tempstore['result'][device].items()
+            }
+            for device in tempstore['result']
+        }
+        if changed:
             logging.debug("Tempstore has changed")
-            self.tempstore = tempstore['result']
             self.change_state(self.state)
-        else:
-            self.tempstore = tempstore['result']
-        for device in self.tempstore:
-            for x in self.tempstore[device]:
-                length = len(self.tempstore[device][x])
-                if length < self.tempstore_size:
-                    for _ in range(1, self.tempstore_size - length):
-                        self.tempstore[device][x].insert(0, 0)
         logging.info(f"Temp store: {list(self.tempstore)}")
 
     def config_section_exists(self, section):
-        return section in self.get_config_section_list()
+        return section in self.section_names
 
     def set_dev_stat(self, dev, stat, value):
         if dev not in self.devices:
             return
-
-        self.devices[dev][stat] = value
+        with self.lock:
+            self.devices[dev][stat] = value
 
     def _update_temp_store(self):
         if self.tempstore is None:
             return False
         for device in self.tempstore:
             for x in self.tempstore[device]:
-                self.tempstore[device][x].pop(0)
                 temp = self.get_dev_stat(device, x[:-1])
-                if temp is None:
-                    temp = 0
-                self.tempstore[device][x].append(temp)
+                self.tempstore[device][x].append(temp or 0)
         return True
@@ -0,0 +1,65 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+
+from ks_includes import functions, json_codec
+
+
+class PrinterCache:
+    """
+    Keeps the last known Klipper config, printer info and power devices of each printer on disk
+
+    The cache allows showing the menus before Moonraker and Klipper are ready,
+    it's only rewritten when the cached data changes
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = functions.get_cache_dir()
+        self.path = path
+        self.hashes = {}
+
+    def filename(self, name):
+        return os.path.join(self.path, f"printer_{re.sub(r'[^A-Za-z0-9_.-]', '_', name)}.json")
+
+    @staticmethod
+    def data_hash(*data):
+        return hashlib.sha1(json_codec.dumps(data).encode()).hexdigest()
+
+    def load(self, name):
+        try:
+            with open(self.filename(name), "rb") as f:
+                cached = json_codec.loads(f.read())
+            self.hashes[name] = cached['hash']
+            return cached
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logging.error(f"Unable to read the printer cache: {e}")
+            return None
+
+    def save(self, name, printer_info, config, power_devices):
+        # Called before Printer.reinit converts the values of the config
+        data_hash = self.data_hash(printer_info, config, power_devices)
+        if self.hashes.get(name) == data_hash:
+            return
+        self.hashes[name] = data_hash
+        cached = {
+            "hash": data_hash,
+            "printer_info": printer_info,
+            "status": {"configfile": {"config": config}},
+            "power_devices": power_devices,
+        }
+        threading.Thread(target=self._write, args=(self.filename(name), json_codec.dumps(cached)), daemon=True).start()
+
+    def _write(self, filename, data):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(f"{filename}.tmp", "w") as f:
+                f.write(data)
+            os.replace(f"{filename}.tmp", filename)
+            logging.info(f"Printer cache saved: {filename}")
+        except OSError as e:
+            logging.error(f"Unable to write the printer cache: {e}")
@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+class StartupProfiler:
+    """
+    Records the duration of the startup phases as Chrome trace events
+
+    Open the resulting file in chrome://tracing or https://ui.perfetto.dev
+    Recording does nothing until enable() is called.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.start = time.monotonic()
+        self.events = []
+        self.lock = threading.Lock()
+
+    def enable(self, path):
+        self.enabled = True
+        self.path = path
+        self.start = time.monotonic()
+        logging.info(f"Profiling startup to {path}")
+
+    def _timestamp(self, when):
+        # Microseconds since the profiler was enabled
+        return round((when - self.start) * 1e6)
+
+    def add(self, name, category, start, end=None, **args):
+        if not self.enabled:
+            return
+        end = time.monotonic() if end is None else end
+        event = {
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": self._timestamp(start),
+            "dur": round((end - start) * 1e6),
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        }
+        if args:
+            event["args"] = args
+        with self.lock:
+            self.events.append(event)
+
+    def mark(self, name, category="startup"):
+        if not self.enabled:
+            return
+        with self.lock:
+            self.events.append({
+                "name": name,
+                "cat": category,
+                "ph": "i",
+                "s": "g",
+                "ts": self._timestamp(time.monotonic()),
+                "pid": os.getpid(),
+                "tid": threading.get_ident(),
+            })
+
+    @contextmanager
+    def phase(self, name, category="startup", **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.add(name, category, start, **args)
+
+    def finish(self):
+        if not self.enabled:
+            return False
+        self.mark("Finished")
+        self.enabled = False
+        with self.lock:
+            events, self.events = self.events, []
+        threads = {event["tid"] for event in events}
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        events.extend(
+            {"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid, "args": {"name": names.get(tid, tid)}}
+            for tid in threads
+        )
+        try:
+            with open(self.path, "w") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            logging.info(f"Startup profile saved: {self.path}")
+        except OSError as e:
+            logging.error(f"Unable to save the startup profile: {e}")
+        return False
+
+
+profiler = StartupProfiler()
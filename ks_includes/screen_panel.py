@@ -46,19 +46,37 @@ class ScreenPanel:
         else:
             self._screen._ws.klippy.emergency_stop()
 
-    def get_file_image(self, filename, width=None, height=None, small=False):
+    def get_file_image(self, filename, callback, width=None, height=None, small=False, priority=0, group=None):
+        """
+        Calls callback with the thumbnail pixbuf or None
+
+        Thumbnails in memory are returned immediately, the others are decoded in the background
+        """
         if not self._files.has_thumbnail(filename):
-            return None
+            return callback(None)
         loc = self._files.get_thumbnail_location(filename, small)
         if loc is None:
-            return None
+            return callback(None)
         width = width if width is not None else self._gtk.img_width
         height = height if height is not None else self._gtk.img_height
-        if loc[0] == "file":
-            return self._gtk.PixbufFromFile(loc[1], width, height)
-        if loc[0] == "http":
-            return self._gtk.PixbufFromHttp(loc[1], width, height)
-        return None
+        key = self._screen.thumbnails.key(self._screen.connected_printer, loc[1],
+                                          self._files.get_file_info(filename)['modified'], int(width), int(height))
+        return self._screen.thumbnail_loader.load(filename, key, loc, width, height, callback, priority, group)
+
+    def evaluate_enable(self, enable):
+        if enable == "{{ moonraker_connected }}":
+            logging.info(f"moonraker connected {self._screen._ws.connected}")
+            return self._screen._ws.connected
+        elif enable == "{{ camera_configured }}":
+            return self.ks_printer_cfg and self.ks_printer_cfg.get("camera_url", None) is not None
+        j2_data = self._printer.get_printer_status_data()
+        try:
+            j2_temp = self._screen.get_template(enable)
+            result = j2_temp.render(j2_data)
+            return result == 'True'
+        except Exception as e:
+            logging.debug(f"Error evaluating enable statement: {enable}\n{e}")
+            return False
 
     def menu_item_clicked(self, widget, panel, item):
         self._screen.show_panel(panel, item['panel'], item['name'], 1, False)
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+import pathlib
+
+from ks_includes import functions
+
+klipperscreendir = pathlib.Path(__file__).parent.resolve().parent
+
+
+class StyleCache:
+    """
+    Builds the stylesheet of a theme and keeps it on disk
+
+    The cached stylesheet is used while the theme, font size and the modification times
+    of its sources are unchanged, so the sources are not read and combined on every start
+    """
+
+    def __init__(self, path=None):
+        self.path = functions.get_cache_dir() if path is None else path
+
+    @staticmethod
+    def sources(theme):
+        styles = os.path.join(klipperscreendir, "styles")
+        return (
+            os.path.join(styles, "base.css"),
+            os.path.join(styles, "base.conf"),
+            os.path.join(styles, theme, "style.css"),
+            os.path.join(styles, theme, "style.conf"),
+        )
+
+    def key(self, theme, font_size):
+        mtimes = [os.path.getmtime(f) if os.path.exists(f) else 0 for f in self.sources(theme)]
+        return hashlib.sha1(f"{theme} {font_size} {mtimes}".encode()).hexdigest()
+
+    def load(self, theme, font_size):
+        """Returns the css of the theme and its graph colors"""
+        key = self.key(theme, font_size)
+        filename = os.path.join(self.path, f"style_{theme}.json")
+        try:
+            with open(filename) as f:
+                cached = json.load(f)
+            if cached['key'] == key:
+                return cached['css'], cached['graph_colors']
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logging.error(f"Unable to read the style cache: {e}")
+
+        css, graph_colors = self.build(theme, font_size)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            with open(f"{filename}.tmp", "w") as f:
+                json.dump({"key": key, "css": css, "graph_colors": graph_colors}, f)
+            os.replace(f"{filename}.tmp", filename)
+        except OSError as e:
+            logging.error(f"Unable to write the style cache: {e}")
+        return css, graph_colors
+
+    def build(self, theme, font_size):
+        base_css, base_conf, theme_style, theme_style_conf = self.sources(theme)
+        css_data = pathlib.Path(base_css).read_text()
+
+        with open(base_conf) as f:
+            style_options = json.load(f)
+
+        if os.path.exists(theme_style):
+            with open(theme_style) as css:
+                css_data += css.read()
+        if os.path.exists(theme_style_conf):
+            try:
+                with open(theme_style_conf) as f:
+                    style_options.update(json.load(f))
+            except Exception as e:
+                logging.error(f"Unable to parse custom template conf file:\n{e}")
+
+        for i in range(len(style_options['graph_colors']['extruder']['colors'])):
+            num = "" if i == 0 else i
+            css_data += "\n.graph_label_extruder%s {border-left-color: #%s}" % (
+                num,
+                style_options['graph_colors']['extruder']['colors'][i]
+            )
+        for i in range(len(style_options['graph_colors']['bed']['colors'])):
+            css_data += "\n.graph_label_heater_bed%s {border-left-color: #%s}" % (
+                "" if i == 0 else i + 1,
+                style_options['graph_colors']['bed']['colors'][i]
+            )
+        for i in range(len(style_options['graph_colors']['fan']['colors'])):
+            css_data += "\n.graph_label_fan_%s {border-left-color: #%s}" % (
+                i + 1,
+                style_options['graph_colors']['fan']['colors'][i]
+            )
+        for i in range(len(style_options['graph_colors']['sensor']['colors'])):
+            css_data += "\n.graph_label_sensor_%s {border-left-color: #%s}" % (
+                i + 1,
+                style_options['graph_colors']['sensor']['colors'][i]
+            )
+
+        css_data = css_data.replace("KS_FONT_SIZE", f"{font_size}")
+        return css_data, style_options['graph_colors']
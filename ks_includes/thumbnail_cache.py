@@ -0,0 +1,119 @@
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import gi
+
+gi.require_version("GdkPixbuf", "2.0")
+from gi.repository import GdkPixbuf, GLib
+
+from ks_includes import functions
+
+
+class ThumbnailCache:
+    """
+    Keeps scaled thumbnails in memory and on disk
+
+    Thumbnails are keyed by the file, its modification time and the target size,
+    so each image is downloaded and decoded once. Both levels drop the least recently used
+    thumbnails when they go over their byte budget.
+    """
+
+    def __init__(self, path=None, memory_budget=16 * 1024 * 1024, disk_budget=64 * 1024 * 1024):
+        self.path = os.path.join(functions.get_cache_dir(), "thumbnails") if path is None else path
+        self.memory_budget = memory_budget
+        self.disk_budget = disk_budget
+        self.memory = OrderedDict()
+        self.memory_size = 0
+        # The disk index is only used from the writer thread
+        self.disk = None
+        self.disk_size = 0
+        self.writer = ThreadPoolExecutor(max_workers=1)
+
+    @staticmethod
+    def key(*args):
+        return hashlib.sha1(" ".join(str(arg) for arg in args).encode()).hexdigest()
+
+    def filename(self, key):
+        return os.path.join(self.path, f"{key}.png")
+
+    @staticmethod
+    def size(pixbuf):
+        return pixbuf.get_rowstride() * pixbuf.get_height()
+
+    def get(self, key):
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            return self.memory[key]
+        return None
+
+    def load(self, key):
+        """Reads the thumbnail from disk, it's stored in memory when it's put back in the main loop"""
+        try:
+            pixbuf = GdkPixbuf.Pixbuf.new_from_file(self.filename(key))
+        except GLib.Error:
+            return None
+        self.writer.submit(self._touch, key)
+        return pixbuf
+
+    def put(self, key, pixbuf):
+        """Stores the pixbuf and returns it"""
+        if pixbuf is not None:
+            self._remember(key, pixbuf)
+            self.writer.submit(self._write, key, pixbuf)
+        return pixbuf
+
+    def _remember(self, key, pixbuf):
+        if key in self.memory:
+            self.memory_size -= self.size(self.memory.pop(key))
+        self.memory[key] = pixbuf
+        self.memory_size += self.size(pixbuf)
+        while self.memory_size > self.memory_budget and len(self.memory) > 1:
+            _key, evicted = self.memory.popitem(last=False)
+            self.memory_size -= self.size(evicted)
+
+    def _scan(self):
+        self.disk = OrderedDict()
+        try:
+            entries = sorted(os.scandir(self.path), key=lambda entry: entry.stat().st_mtime)
+        except FileNotFoundError:
+            entries = []
+        for entry in entries:
+            if entry.name.endswith(".png"):
+                self.disk[entry.name[:-4]] = entry.stat().st_size
+        self.disk_size = sum(self.disk.values())
+
+    def _touch(self, key):
+        if self.disk is None:
+            self._scan()
+        if key in self.disk:
+            self.disk.move_to_end(key)
+            try:
+                os.utime(self.filename(key))
+            except OSError:
+                pass
+
+    def _write(self, key, pixbuf):
+        if self.disk is None:
+            self._scan()
+        if key in self.disk:
+            return
+        filename = self.filename(key)
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            pixbuf.savev(f"{filename}.tmp", "png", [], [])
+            os.replace(f"{filename}.tmp", filename)
+            self.disk[key] = os.path.getsize(filename)
+        except (GLib.Error, OSError) as e:
+            logging.error(f"Unable to write the thumbnail cache: {e}")
+            return
+        self.disk_size += self.disk[key]
+        while self.disk_size > self.disk_budget and len(self.disk) > 1:
+            evicted, size = self.disk.popitem(last=False)
+            self.disk_size -= size
+            try:
+                os.remove(self.filename(evicted))
+            except OSError:
+                pass
@@ -0,0 +1,118 @@
+import heapq
+import itertools
+import logging
+import threading
+
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+from ks_includes.KlippyGtk import KlippyGtk
+
+
+class ThumbnailLoader:
+    """
+    Downloads and decodes thumbnails in worker threads
+
+    Jobs with the lowest priority are served first, the pixbufs are stored in the cache
+    and handed to the callbacks in the main loop. Requests for a thumbnail that is already
+    queued or loading are added to that job. Callbacks are grouped by their requester,
+    so a group can be reprioritized or cancelled as a whole.
+    """
+
+    def __init__(self, screen, cache, workers=2):
+        self._screen = screen
+        self.cache = cache
+        self.queue = []
+        # The queued and running jobs by key
+        self.jobs = {}
+        self.counter = itertools.count()
+        self.condition = threading.Condition()
+        for i in range(workers):
+            threading.Thread(target=self._work, name=f"thumbnails-{i}", daemon=True).start()
+
+    def load(self, filename, key, location, width, height, callback, priority=0, group=None):
+        pixbuf = self.cache.get(key)
+        if pixbuf is not None:
+            return callback(pixbuf)
+        with self.condition:
+            job = self.jobs.get(key)
+            if job is not None:
+                job['callbacks'].append((callback, group))
+                for i, (value, seq, queued) in enumerate(self.queue):
+                    if queued is job and priority < value:
+                        self.queue[i] = (priority, seq, job)
+                        heapq.heapify(self.queue)
+                        break
+                return
+            job = {
+                "filename": filename,
+                "key": key,
+                "location": location,
+                "width": width,
+                "height": height,
+                "callbacks": [(callback, group)],
+            }
+            self.jobs[key] = job
+            heapq.heappush(self.queue, (priority, next(self.counter), job))
+            self.condition.notify()
+
+    def reprioritize(self, group, priority):
+        """priority is called with the filename of each queued job of the group"""
+        with self.condition:
+            queue = []
+            for value, seq, job in self.queue:
+                groups = [item[1] for item in job['callbacks']]
+                if group in groups:
+                    # Jobs shared with other groups keep their priority if it's higher
+                    new = priority(job['filename'])
+                    value = new if all(item is group for item in groups) else min(value, new)
+                queue.append((value, seq, job))
+            heapq.heapify(queue)
+            self.queue = queue
+
+    def cancel(self, group):
+        with self.condition:
+            for job in self.jobs.values():
+                job['callbacks'] = [item for item in job['callbacks'] if item[1] is not group]
+            # Running jobs are finished for the cache, the queued ones without callbacks are dropped
+            for entry in self.queue:
+                if not entry[2]['callbacks']:
+                    del self.jobs[entry[2]['key']]
+            self.queue = [entry for entry in self.queue if entry[2]['callbacks']]
+            heapq.heapify(self.queue)
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.queue:
+                    self.condition.wait()
+                job = heapq.heappop(self.queue)[2]
+            try:
+                pixbuf = self._decode(job)
+            except Exception as e:
+                logging.exception(f"Unable to load the thumbnail of {job['filename']}: {e}")
+                pixbuf = None
+            GLib.idle_add(self._done, job, pixbuf)
+
+    def _decode(self, job):
+        pixbuf = self.cache.load(job['key'])
+        if pixbuf is not None:
+            return pixbuf
+        source, path = job['location']
+        if source == "file":
+            return KlippyGtk.PixbufFromFile(path, job['width'], job['height'])
+        if source == "http" and self._screen.apiclient is not None:
+            response = self._screen.apiclient.get_thumbnail_stream(path)
+            return KlippyGtk.PixbufFromBytes(response, job['width'], job['height'])
+        return None
+
+    def _done(self, job, pixbuf):
+        with self.condition:
+            self.jobs.pop(job['key'], None)
+            callbacks = job['callbacks']
+        self.cache.put(job['key'], pixbuf)
+        for callback, _group in callbacks:
+            callback(pixbuf)
+        return False
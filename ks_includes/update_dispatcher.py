@@ -0,0 +1,86 @@
+import gi
+
+gi.require_version("Gtk", "3.0")
+from gi.repository import GLib
+
+
+class UpdateDispatcher:
+    """
+    Coalesces status deltas and delivers them as one merged update per frame
+
+    Values for the same object/field are superseded by the latest delta, so the cost of
+    redrawing panels depends on the frame rate (or max_rate) instead of Moonraker's update rate.
+    """
+
+    def __init__(self, widget, callback, max_rate=0):
+        self.widget = widget
+        self.callback = callback
+        # Frame clock times are in microseconds
+        self.min_interval = int(1e6 / max_rate) if max_rate > 0 else 0
+        self.last_flush = 0
+        self.pending = {}
+        self.tick_id = None
+        self.idle_id = None
+        self.timeout_id = None
+
+    def push(self, data):
+        for key, value in data.items():
+            if isinstance(value, dict):
+                self.pending.setdefault(key, {}).update(value)
+            else:
+                self.pending[key] = value
+        self._schedule()
+
+    def _schedule(self):
+        if self.tick_id is not None or self.idle_id is not None or self.timeout_id is not None:
+            return
+        if self.widget.get_mapped():
+            self.tick_id = self.widget.add_tick_callback(self._on_tick)
+        else:
+            # Without a running frame clock there are no ticks
+            self.idle_id = GLib.idle_add(self._on_idle)
+
+    def _on_tick(self, widget, frame_clock):
+        self.tick_id = None
+        frame_time = frame_clock.get_frame_time()
+        remaining = self.min_interval - (frame_time - self.last_flush)
+        if remaining > 0:
+            # Waits for the rest of the interval without waking up on every frame
+            self.timeout_id = GLib.timeout_add(max(remaining // 1000, 1), self._on_timeout)
+            return GLib.SOURCE_REMOVE
+        self.last_flush = frame_time
+        self.flush()
+        return GLib.SOURCE_REMOVE
+
+    def _on_timeout(self):
+        self.timeout_id = None
+        # The frame clock uses the monotonic time too
+        self.last_flush = GLib.get_monotonic_time()
+        return self.flush()
+
+    def _on_idle(self):
+        self.idle_id = None
+        return self.flush()
+
+    def _cancel(self):
+        if self.tick_id is not None:
+            self.widget.remove_tick_callback(self.tick_id)
+            self.tick_id = None
+        if self.idle_id is not None:
+            GLib.source_remove(self.idle_id)
+            self.idle_id = None
+        if self.timeout_id is not None:
+            GLib.source_remove(self.timeout_id)
+            self.timeout_id = None
+
+    def flush(self, *args):
+        self._cancel()
+        if not self.pending:
+            return False
+        data, self.pending = self.pending, {}
+        self.callback("notify_status_update", data)
+        return False
+
+    def clear(self):
+        self._cancel()
+        self.pending = {}
@@ -2,6 +2,7 @@ import datetime
 import logging
 import math
 
+import cairo
 import gi
 
 gi.require_version("Gtk", "3.0")
@@ -16,6 +17,10 @@ class HeaterGraph(Gtk.DrawingArea):
         self.get_style_context().add_class('heatergraph')
         self.printer = printer
         self.store = {}
+        self.columns = {}
+        self.static_layer = None
+        self.time_layer = None
+        self.data_layer = None
         self.max_length = 0
         self.connect('draw', self.draw_graph)
         self.add_events(Gdk.EventMask.TOUCH_MASK)
@@ -46,17 +51,86 @@ class HeaterGraph(Gtk.DrawingArea):
         return min(len(self.printer.get_temp_store(name, "temperatures"))
                    for name in self.store if "temperatures" in self.store[name])
 
-    def get_max_num(self, data_points=0):
-        mnum = [0]
-        for device in self.store:
-            if self.store[device]['show']:
-                temp = self.printer.get_temp_store(device, "temperatures", data_points)
-                if temp:
-                    mnum.append(max(temp))
-                target = self.printer.get_temp_store(device, "targets", data_points)
-                if target:
-                    mnum.append(max(target))
-        return max(mnum)
+    def get_columns(self, name, dev_type, spc, data_points):
+        """
+        Returns the (column, (min, max)) pairs of the last data_points samples, spc samples per column
+
+        Columns are numbered by absolute sample number, so only the newest column has to be recomputed
+        when samples are appended and the cost does not depend on the size of the temperature store
+        """
+        series = self.printer.get_temp_store_series(name, dev_type)
+        if series is None:
+            return None
+        cache = self.columns.get((name, dev_type))
+        if cache is None or cache['series'] is not series or cache['spc'] != spc:
+            cache = {'series': series, 'spc': spc, 'complete': None, 'evicted': None, 'extrema': {}}
+            self.columns[(name, dev_type)] = cache
+        first = (series.count - data_points) // spc
+        last = (series.count - 1) // spc
+        # Samples numbered below this were overwritten in the ring buffer
+        evicted = series.count - len(series)
+        extrema = cache['extrema']
+        for column in [c for c in extrema if c < first]:
+            del extrema[column]
+        for column in range(first, last + 1):
+            if (column not in extrema or cache['complete'] is None or column >= cache['complete']
+                    or (column * spc < evicted and evicted != cache['evicted'])):
+                extrema[column] = series.extrema(column * spc, (column + 1) * spc)
+        # The last column may still receive samples and the oldest ones may lose them
+        cache['complete'] = last
+        cache['evicted'] = evicted
+        return [(column, extrema[column]) for column in range(first, last + 1) if extrema[column] is not None]
+
+    def get_series(self, spc, data_points):
+        series = {}
+        for name in self.store:
+            if not self.store[name]['show']:
+                continue
+            for dev_type in self.store[name]:
+                if dev_type == "show":
+                    continue
+                columns = self.get_columns(name, dev_type, spc, data_points)
+                if columns:
+                    series[(name, dev_type)] = columns
+        return series
+
+    @staticmethod
+    def get_max_num(series):
+        return max([0] + [max(extrema[1] for column, extrema in columns) for columns in series.values()])
+
+    def get_static_layer(self, width, height, gsize, max_num):
+        """Border, grid lines and temperature labels, rendered once per size and scale"""
+        key = (width, height, max_num)
+        if self.static_layer is None or self.static_layer[0] != key:
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+            ctx = cairo.Context(surface)
+            ctx.set_source_rgb(.5, .5, .5)
+            ctx.set_line_width(1)
+            ctx.set_tolerance(0.1)
+
+            ctx.move_to(gsize[0][0], gsize[0][1])
+            ctx.line_to(gsize[1][0], gsize[0][1])
+            ctx.line_to(gsize[1][0], gsize[1][1])
+            ctx.line_to(gsize[0][0], gsize[1][1])
+            ctx.line_to(gsize[0][0], gsize[0][1])
+            ctx.stroke()
+
+            hscale = self.graph_lines(ctx, gsize, max_num)
+            self.static_layer = (key, surface, hscale)
+        return self.static_layer[1:]
+
+    def get_time_layer(self, width, height, gsize, points_per_pixel, now):
+        """Time lines and labels, rendered once per minute and shifted according to the seconds"""
+        minute = now.replace(second=0, microsecond=0)
+        key = (width, height, points_per_pixel, self.max_length, minute)
+        if self.time_layer is None or self.time_layer[0] != key:
+            surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+            ctx = cairo.Context(surface)
+            ctx.set_line_width(1)
+            ctx.set_tolerance(0.1)
+            self.graph_time(ctx, gsize, points_per_pixel, minute)
+            self.time_layer = (key, surface)
+        return self.time_layer[1]
 
     def draw_graph(self, da, ctx):
         width = da.get_allocated_width()
@@ -67,20 +141,9 @@ class HeaterGraph(Gtk.DrawingArea):
         g_height_start = 10
         g_height = height - self.font_size * 2
 
-        ctx.set_source_rgb(.5, .5, .5)
         ctx.set_line_width(1)
         ctx.set_tolerance(0.1)
 
-        ctx.move_to(g_width_start, g_height_start)
-        ctx.line_to(g_width, g_height_start)
-        ctx.line_to(g_width, g_height)
-        ctx.line_to(g_width_start, g_height)
-        ctx.line_to(g_width_start, g_height_start)
-        ctx.stroke()
-
-        ctx.set_source_rgb(1, 0, 0)
-        ctx.move_to(g_width_start, height)
-
         gsize = [
             [g_width_start, g_height_start],
             [g_width, g_height]
@@ -88,56 +151,143 @@ class HeaterGraph(Gtk.DrawingArea):
 
         self.max_length = self.get_max_length()
         graph_width = gsize[1][0] - gsize[0][0]
-        points_per_pixel = self.max_length / graph_width
-        data_points = int(round(graph_width * points_per_pixel, 0))
-        max_num = math.ceil(self.get_max_num(data_points) * 1.1 / 10) * 10
-        if points_per_pixel == 0:
+        if self.max_length == 0 or graph_width <= 0:
             return
+        points_per_pixel = self.max_length / graph_width
+        # Downsample to one min/max pair per pixel column
+        spc = max(1, math.ceil(points_per_pixel))
+        series = self.get_series(spc, self.max_length)
+        max_num = math.ceil(self.get_max_num(series) * 1.1 / 10) * 10
         d_width = 1 / points_per_pixel
 
-        d_height_scale = self.graph_lines(ctx, gsize, max_num)
-        self.graph_time(ctx, gsize, points_per_pixel)
+        static_key = None if self.static_layer is None else self.static_layer[0]
+        surface, d_height_scale = self.get_static_layer(width, height, gsize, max_num)
+        if static_key is not None and static_key != self.static_layer[0] \
+                and ctx.clip_extents() != (0, 0, width, height):
+            # The scale changed during a partial redraw, the labels need a full one
+            self.queue_draw()
+        ctx.set_source_surface(surface, 0, 0)
+        ctx.paint()
 
-        for name in self.store:
-            if not self.store[name]['show']:
-                continue
-            for dev_type in self.store[name]:
-                d = self.printer.get_temp_store(name, dev_type, data_points)
-                if d is False:
-                    continue
-                self.graph_data(ctx, d, gsize, d_height_scale, d_width, self.store[name][dev_type]["rgb"],
+        now = datetime.datetime.now()
+        ctx.save()
+        ctx.rectangle(gsize[0][0], 0, width - gsize[0][0], height)
+        ctx.clip()
+        ctx.set_source_surface(self.get_time_layer(width, height, gsize, points_per_pixel, now),
+                               -now.second / points_per_pixel, 0)
+        ctx.paint()
+        ctx.restore()
+
+        ctx.set_source_surface(self.get_data_layer(width, height, gsize, series, spc, d_width, d_height_scale), 0, 0)
+        ctx.paint()
+
+    def get_data_layer(self, width, height, gsize, series, spc, d_width, hscale):
+        """
+        Series lines, kept between frames
+
+        When only new samples were added the previous frame is shifted left by the elapsed pixels
+        and only the newest columns are drawn again
+        """
+        objects = {key: self.printer.get_temp_store_series(*key) for key in series}
+        ref = max(obj.count for obj in objects.values()) if objects else 0
+        # Pixel offset of the oldest sample, rounded so the previous frame can be shifted by whole pixels
+        origin = math.floor((ref - self.max_length) * d_width)
+        key = (width, height, hscale, spc, self.max_length, tuple(
+            (name, dev_type, objects[(name, dev_type)], ref - objects[(name, dev_type)].count,
+             tuple(self.store[name][dev_type]["rgb"]), self.store[name][dev_type]["dashed"],
+             self.store[name][dev_type]["fill"])
+            for name, dev_type in series
+        ))
+        plot = (gsize[0][0], gsize[0][1], gsize[1][0] - gsize[0][0], gsize[1][1] - gsize[0][1])
+        layer = self.data_layer
+
+        if layer is not None and layer['key'] == key and layer['ref'] == ref:
+            return layer['surface']
+
+        surface = cairo.ImageSurface(cairo.FORMAT_ARGB32, width, height)
+        ctx = cairo.Context(surface)
+        ctx.set_line_width(1)
+        ctx.set_tolerance(0.1)
+        ctx.rectangle(*plot)
+        ctx.clip()
+
+        first_x = None
+        if layer is not None and layer['key'] == key and 0 <= origin - layer['origin'] < plot[2]:
+            ctx.set_operator(cairo.OPERATOR_SOURCE)
+            ctx.set_source_surface(layer['surface'], layer['origin'] - origin, 0)
+            ctx.paint()
+            # The columns that were still receiving samples have to be drawn again
+            first_x = min(
+                gsize[0][0] + ((layer['last'][name] - 1) * spc + ref - objects[name].count) * d_width - origin
+                for name in series if name in layer['last']
+            ) - 1
+            ctx.rectangle(first_x, plot[1], plot[0] + plot[2] - first_x, plot[3])
+            ctx.clip()
+            ctx.set_operator(cairo.OPERATOR_CLEAR)
+            ctx.paint()
+            ctx.set_operator(cairo.OPERATOR_OVER)
+
+        last = {}
+        for (name, dev_type), columns in series.items():
+            points = self.get_points(columns, ref - objects[(name, dev_type)].count, spc, d_width, origin, gsize,
+                                     hscale)
+            if first_x is not None:
+                # Keep a few columns at the left of the redrawn area to join the existing lines
+                margin = first_x - 4 * spc * d_width
+                points = [point for point in points if point[0] >= margin]
+            if points:
+                self.graph_data(ctx, points, origin, gsize, self.store[name][dev_type]["rgb"],
                                 self.store[name][dev_type]["dashed"], self.store[name][dev_type]["fill"])
+            last[(name, dev_type)] = columns[-1][0]
+
+        self.data_layer = {'key': key, 'ref': ref, 'origin': origin, 'last': last, 'surface': surface}
+        return surface
 
     @staticmethod
-    def graph_data(ctx, data, gsize, hscale, swidth, rgb, dashed=False, fill=False):
-        i = 0
+    def get_points(columns, shift, spc, d_width, origin, gsize, hscale):
+        y_min = gsize[0][1]
+        y_max = gsize[1][1]
+        return [
+            (gsize[0][0] + (column * spc + shift) * d_width - origin,
+             max(y_min, min(y_max, y_max - 1 - (low * hscale))),
+             max(y_min, min(y_max, y_max - 1 - (high * hscale))))
+            for column, (low, high) in columns
+        ]
+
+    @staticmethod
+    def graph_data(ctx, points, origin, gsize, rgb, dashed=False, fill=False):
         ctx.set_source_rgba(rgb[0], rgb[1], rgb[2], 1)
-        ctx.move_to(gsize[0][0] + 1, gsize[0][1] - 1)
         if dashed:
-            ctx.set_dash([10, 5])
+            # Anchor the pattern to the samples, so it stays continuous when the graph scrolls
+            ctx.set_dash([10, 5], (points[0][0] + origin) % 15)
         else:
             ctx.set_dash([1, 0])
-        d_len = len(data) - 1
-        for d in data:
-            p_x = i * swidth + gsize[0][0] if i != d_len else gsize[1][0] - 1
-            p_y = max(gsize[0][1], min(gsize[1][1], gsize[1][1] - 1 - (d * hscale)))
+        for i, (p_x, p_low, p_high) in enumerate(points):
             if i == 0:
-                ctx.move_to(gsize[0][0] + 1, p_y)
-                i += 1
-                continue
-            ctx.line_to(p_x, p_y)
-            i += 1
+                ctx.move_to(p_x, p_low)
+            else:
+                ctx.line_to(p_x, p_low)
+            if p_high != p_low:
+                ctx.line_to(p_x, p_high)
         if fill is False:
             ctx.stroke()
             return
 
         ctx.stroke_preserve()
-        ctx.line_to(gsize[1][0] - 1, gsize[1][1] - 1)
-        ctx.line_to(gsize[0][0] + 1, gsize[1][1] - 1)
+        ctx.line_to(points[-1][0], gsize[1][1] - 1)
+        ctx.line_to(points[0][0], gsize[1][1] - 1)
         if fill:
             ctx.set_source_rgba(rgb[0], rgb[1], rgb[2], .1)
             ctx.fill()
 
+    def update(self):
+        """Redraws the plot area, the axis labels are only redrawn when needed"""
+        if self.static_layer is None:
+            self.queue_draw()
+            return
+        x = round(self.font_size * 2.75)
+        self.queue_draw_area(x, 0, self.get_allocated_width() - x, self.get_allocated_height())
+
     def graph_lines(self, ctx, gsize, max_num):
         nscale = 10
         max_num = min(max_num, 999)
@@ -160,9 +310,7 @@ class HeaterGraph(Gtk.DrawingArea):
             ctx.stroke()
         return hscale
 
-    def graph_time(self, ctx, gsize, points_per_pixel):
-
-        now = datetime.datetime.now()
+    def graph_time(self, ctx, gsize, points_per_pixel, now):
         first = gsize[1][0] - (now.second + ((now.minute % 2) * 60)) / points_per_pixel
         steplen = 120 / points_per_pixel  # For 120s
 
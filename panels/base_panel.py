@@ -6,7 +6,6 @@ import gi
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import GLib, Gtk, Pango
-from jinja2 import Environment
 from datetime import datetime
 from math import log
 
@@ -129,6 +128,8 @@ class BasePanel(ScreenPanel):
         try:
             for child in self.control['temp_box'].get_children():
                 self.control['temp_box'].remove(child)
+            if self._printer is not None:
+                self._printer.remove_listener(self.update_heaters)
             if not show or self._printer.get_temp_store_devices() is None:
                 return
 
@@ -177,9 +178,27 @@ class BasePanel(ScreenPanel):
                     self.control['temp_box'].add(self.labels[f"{device}_box"])
                     n += 1
             self.control['temp_box'].show_all()
+            devices = self._printer.get_temp_store_devices()
+            self._printer.add_listener(self.update_heaters, *[(device, "temperature") for device in devices])
+            self.update_heaters({device: {} for device in devices})
         except Exception as e:
             logging.debug(f"Couldn't create heaters box: {e}")
 
+    def update_heaters(self, changes):
+        for device in changes:
+            temp = self._printer.get_dev_stat(device, "temperature")
+            if temp is None or device not in self.labels:
+                continue
+            name = ""
+            if not (device.startswith("extruder") or device.startswith("heater_bed")):
+                if self.titlebar_name_type == "full":
+                    name = device.split()[1] if len(device.split()) > 1 else device
+                    name = f'{name.capitalize().replace("_", " ")}: '
+                elif self.titlebar_name_type == "short":
+                    name = device.split()[1] if len(device.split()) > 1 else device
+                    name = f"{name[:1].upper()}: "
+            self.labels[device].set_label(f"{name}{int(temp)}°")
+
     def get_icon(self, device, img_size):
         if device.startswith("extruder"):
             if self._printer.extrudercount > 1:
@@ -244,20 +263,6 @@ class BasePanel(ScreenPanel):
 
         if action != "notify_status_update" or self._screen.printer is None:
             return
-        devices = self._printer.get_temp_store_devices()
-        if devices is not None:
-            for device in devices:
-                temp = self._printer.get_dev_stat(device, "temperature")
-                if temp is not None and device in self.labels:
-                    name = ""
-                    if not (device.startswith("extruder") or device.startswith("heater_bed")):
-                        if self.titlebar_name_type == "full":
-                            name = device.split()[1] if len(device.split()) > 1 else device
-                            name = f'{name.capitalize().replace("_", " ")}: '
-                        elif self.titlebar_name_type == "short":
-                            name = device.split()[1] if len(device.split()) > 1 else device
-                            name = f"{name[:1].upper()}: "
-                    self.labels[device].set_label(f"{name}{int(temp)}°")
 
         for key, value in data.items():
             if not key.startswith('gcode_macro'):
@@ -315,6 +320,12 @@ class BasePanel(ScreenPanel):
     def toggle_macro_shorcut_sensitive(self, value=True):
         self.control['macros_shortcut'].set_sensitive(value)
 
+    def set_read_only(self, read_only=True):
+        # Used while the menus of the cached config are shown and the printer isn't ready yet
+        self.content.set_sensitive(not read_only)
+        self.control['macros_shortcut'].set_sensitive(not read_only)
+        self.show_estop(not read_only)
+
     def show_printer_select(self, show=True):
         if show and self.buttons_showing['printer_select'] is False:
             self.action_bar.add(self.control['printer_select'])
@@ -330,9 +341,7 @@ class BasePanel(ScreenPanel):
             self.titlelbl.set_label(f"{self._screen.connecting_to_printer}")
             return
         try:
-            env = Environment(extensions=["jinja2.ext.i18n"], autoescape=True)
-            env.install_gettext_translations(self._config.get_lang())
-            j2_temp = env.from_string(title)
+            j2_temp = self._screen.get_template(title)
             title = j2_temp.render()
         except Exception as e:
             logging.debug(f"Error parsing jinja for title: {title}\n{e}")
@@ -380,8 +380,18 @@ class JobStatusPanel(ScreenPanel):
             self.flow_timeout = GLib.timeout_add_seconds(2, self.update_flow)
         self._screen.base_panel_show_all()
         self.flag_change_filament = False
+        keys = [(x, stat) for x in self._printer.get_tools() + self._printer.get_heaters()
+                for stat in ("temperature", "target", "power")]
+        keys.extend((x, stat) for x in self._printer.get_scales() for stat in ("weight", "tare"))
+        self._printer.add_listener(self.update_devices, *keys)
+        self._printer.add_listener(self.update_message, ("display_status", "message"))
+        self.update_devices({x: {} for x in self._printer.get_tools() + self._printer.get_heaters()
+                             + self._printer.get_scales()})
+        self.update_message()
 
     def deactivate(self):
+        self._printer.remove_listener(self.update_devices)
+        self._printer.remove_listener(self.update_message)
         if self.flow_timeout is not None:
             GLib.source_remove(self.flow_timeout)
             self.flow_timeout = None
@@ -546,35 +556,6 @@ class JobStatusPanel(ScreenPanel):
         elif action != "notify_status_update":
             return
 
-        for x in self._printer.get_tools():
-            if x in self.buttons['extruder']:
-                self.update_temp(
-                    x,
-                    self._printer.get_dev_stat(x, "temperature"),
-                    self._printer.get_dev_stat(x, "target"),
-                    self._printer.get_dev_stat(x, "power"),
-                )
-                self.buttons['extruder'][x].set_label(self.labels[x].get_text())
-        for x in self._printer.get_heaters():
-            if x in self.buttons['heater']:
-                self.update_temp(
-                    x,
-                    self._printer.get_dev_stat(x, "temperature"),
-                    self._printer.get_dev_stat(x, "target"),
-                    self._printer.get_dev_stat(x, "power"),
-                )
-                self.buttons['heater'][x].set_label(self.labels[x].get_text())
-        for x in self._printer.get_scales():
-            if x in self.buttons['scale']:
-                self.update_weight(
-                    x,
-                    self._printer.get_dev_stat(x, "weight"),
-                    self._printer.get_dev_stat(x, "tare")
-                )
-                self.buttons['scale'][x].set_label(self.labels[x].get_text())
-
-        self.update_message()
-
         with contextlib.suppress(KeyError):
             if data["toolhead"]["extruder"] != self.current_extruder:
                 self.labels['temp_grid'].remove_column(0)
@@ -676,6 +657,27 @@ class JobStatusPanel(ScreenPanel):
         else:
             self.buttons['change_filament'].set_visible(False)
 
+    def update_devices(self, changes):
+        for x in changes:
+            if x in self.buttons['scale']:
+                self.update_weight(
+                    x,
+                    self._printer.get_dev_stat(x, "weight"),
+                    self._printer.get_dev_stat(x, "tare")
+                )
+                self.buttons['scale'][x].set_label(self.labels[x].get_text())
+                continue
+            button = self.buttons['extruder'].get(x) or self.buttons['heater'].get(x)
+            if button is None:
+                continue
+            self.update_temp(
+                x,
+                self._printer.get_dev_stat(x, "temperature"),
+                self._printer.get_dev_stat(x, "target"),
+                self._printer.get_dev_stat(x, "power"),
+            )
+            button.set_label(self.labels[x].get_text())
+
     def estimate_change_filament(self):
         scales = self._printer.get_scales()
         filament_weight = self.file_metadata['filament_weight_total']
@@ -879,7 +881,9 @@ class JobStatusPanel(ScreenPanel):
         else:
             width = self._screen.width / 3
             height = self._gtk.content_height * 0.47
-        pixbuf = self.get_file_image(self.filename, width, height)
+        self.get_file_image(self.filename, lambda pixbuf: self.set_file_thumbnail(pixbuf, width, height), width, height)
+
+    def set_file_thumbnail(self, pixbuf, width, height):
         logging.debug(self.filename)
         if pixbuf is None:
             logging.debug("no pixbuf")
@@ -954,7 +958,7 @@ class JobStatusPanel(ScreenPanel):
     def update_progress(self):
         self.labels['progress_text'].set_label(f"{self.progress * 100:.0f}%")
 
-    def update_message(self):
+    def update_message(self, changes=None):
         msg = self._printer.get_stat("display_status", "message")
         if msg is None:
             msg = " "
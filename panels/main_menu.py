@@ -70,8 +70,8 @@ class MainPanel(MenuPanel):
             self.labels['da'].queue_draw()
             self.labels['da'].show()
             if self.graph_update is None:
-                # This has a high impact on load
-                self.graph_update = GLib.timeout_add_seconds(5, self.update_graph)
+                # Only the newest samples are drawn on each update
+                self.graph_update = GLib.timeout_add_seconds(1, self.update_graph)
         elif self.labels['da'] in self.left_panel:
             self.left_panel.remove(self.labels['da'])
             if self.graph_update is not None:
@@ -83,8 +83,14 @@ class MainPanel(MenuPanel):
     def activate(self):
         self.update_graph_visibility()
         self._screen.base_panel_show_all()
+        keys = [(x, stat) for x in self._printer.get_tools() + self._printer.get_heaters()
+                for stat in ("temperature", "target", "power")]
+        keys.extend((x, stat) for x in self._printer.get_scales() for stat in ("weight", "tare"))
+        self._printer.add_listener(self.update_devices, *keys)
+        self.update_devices({x: {} for x in self.devices})
 
     def deactivate(self):
+        self._printer.remove_listener(self.update_devices)
         if self.graph_update is not None:
             GLib.source_remove(self.graph_update)
             self.graph_update = None
@@ -290,23 +296,23 @@ class MainPanel(MenuPanel):
             self.main_menu.attach(self.labels['menu'], 1, 0, 1, 1)
         self.main_menu.show_all()
 
-    def process_update(self, action, data):
-        if action != "notify_status_update":
-            return
-        for x in (self._printer.get_tools() + self._printer.get_heaters()):
+    def update_devices(self, changes):
+        for x in changes:
+            if x not in self.devices:
+                continue
+            if x in self._printer.get_scales():
+                self.update_weight(
+                    x,
+                    self._printer.get_dev_stat(x, "weight"),
+                    self._printer.get_dev_stat(x, "tare")
+                )
+                continue
             self.update_temp(
                 x,
                 self._printer.get_dev_stat(x, "temperature"),
                 self._printer.get_dev_stat(x, "target"),
                 self._printer.get_dev_stat(x, "power"),
             )
-        for x in self._printer.get_scales():
-            self.update_weight(
-                x,
-                self._printer.get_dev_stat(x, "weight"),
-                self._printer.get_dev_stat(x, "tare")
-            )
-        return False
 
     def show_numpad(self, widget, device):
 
@@ -328,5 +334,5 @@ class MainPanel(MenuPanel):
         self.main_menu.show_all()
 
     def update_graph(self):
-        self.labels['da'].queue_draw()
+        self.labels['da'].update()
         return True
@@ -6,7 +6,6 @@ import json
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk
-from jinja2 import Template
 
 from ks_includes.screen_panel import ScreenPanel
 
@@ -16,7 +15,6 @@ def create_panel(*args, **kwargs):
 
 
 class MenuPanel(ScreenPanel):
-    j2_data = None
 
     def __init__(self, screen, title, items=None):
         super().__init__(screen, title)
@@ -67,31 +65,29 @@ class MenuPanel(ScreenPanel):
 
             self.grid.attach(self.labels[key], col, row, width, height)
             i += 1
-        self.j2_data = None
         return self.grid
 
     def create_menu_items(self):
+        printer = self._printer.get_printer_status_data()
         for i in range(len(self.items)):
             key = list(self.items[i])[0]
             item = self.items[i][key]
 
-            printer = self._printer.get_printer_status_data()
-
-            name = self._screen.env.from_string(item['name']).render(printer)
-            icon = self._screen.env.from_string(item['icon']).render(printer) if item['icon'] else None
-            style = self._screen.env.from_string(item['style']).render(printer) if item['style'] else None
+            name = self._screen.get_template(item['name']).render(printer)
+            icon = self._screen.get_template(item['icon']).render(printer) if item['icon'] else None
+            style = self._screen.get_template(item['style']).render(printer) if item['style'] else None
 
             b = self._gtk.Button(icon, name, style or f"color{i % 4 + 1}")
 
             if item['panel'] is not None:
-                panel = self._screen.env.from_string(item['panel']).render(printer)
+                panel = self._screen.get_template(item['panel']).render(printer)
                 b.connect("clicked", self.menu_item_clicked, panel, item)
             elif item['method'] is not None:
                 params = {}
 
                 if item['params'] is not False:
                     try:
-                        p = self._screen.env.from_string(item['params']).render(printer)
+                        p = self._screen.get_template(item['params']).render(printer)
                         params = json.loads(p)
                     except Exception as e:
                         logging.exception(f"Unable to parse parameters for [{name}]:\n{e}")
@@ -104,18 +100,3 @@ class MenuPanel(ScreenPanel):
             else:
                 b.connect("clicked", self._screen._go_to_submenu, key)
             self.labels[key] = b
-
-    def evaluate_enable(self, enable):
-        if enable == "{{ moonraker_connected }}":
-            logging.info(f"moonraker connected {self._screen._ws.connected}")
-            return self._screen._ws.connected
-        elif enable == "{{ camera_configured }}":
-            return self.ks_printer_cfg and self.ks_printer_cfg.get("camera_url", None) is not None
-        self.j2_data = self._printer.get_printer_status_data()
-        try:
-            j2_temp = Template(enable, autoescape=True)
-            result = j2_temp.render(self.j2_data)
-            return result == 'True'
-        except Exception as e:
-            logging.debug(f"Error evaluating enable statement: {enable}\n{e}")
-            return False
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import bisect
 import logging
 import os
 import subprocess
@@ -18,8 +19,9 @@ def create_panel(*args):
 
 class PrintPanel(ScreenPanel):
     cur_directory = "gcodes"
-    dir_panels = {}
-    filelist = {'gcodes': {'directories': [], 'files': []}}
+    # A pool of rows is bound to the entries of the current directory around the viewport,
+    # the spacers above and below stand in for the other entries
+    page_rows = 10
 
     def __init__(self, screen, title):
         super().__init__(screen, title)
@@ -34,10 +36,19 @@ class PrintPanel(ScreenPanel):
         }
         self.sort_icon = ["arrow-up", "arrow-down"]
         self.scroll = self._gtk.ScrolledWindow()
+        adjustment = self.scroll.get_vadjustment()
+        adjustment.connect("changed", self.fill_view)
+        adjustment.connect("value-changed", self.fill_view)
+        # The bound rows by path
         self.files = {}
         self.directories = {}
-        self.labels['directories'] = {}
-        self.labels['files'] = {}
+        self.rows = []
+        self.first = 0
+        self.row_height = 0
+        self.reprioritize_id = None
+        self.media = {}
+        self.icons = {}
+        self.filelist = {'gcodes': self.new_directory()}
         self.source = ""
         self.time_24 = self._config.get_main_config().getboolean("24htime", True)
         logging.info(f"24h time is {self.time_24}")
@@ -72,11 +83,14 @@ class PrintPanel(ScreenPanel):
         self.main.pack_start(pbox, False, False, 0)
         self.main.pack_start(self.scroll, True, True, 0)
 
-        self.dir_panels['gcodes'] = Gtk.Grid()
+        self.spacers = [Gtk.Box(), Gtk.Box()]
+        self.file_box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=0)
+        for spacer in self.spacers:
+            self.file_box.pack_start(spacer, False, False, 0)
 
         GLib.idle_add(self.reload_files)
 
-        self.scroll.add(self.dir_panels['gcodes'])
+        self.scroll.add(self.file_box)
         self.content.add(self.main)
         self._screen.files.add_file_callback(self._callback)
         self.showing_rename = False
@@ -86,28 +100,47 @@ class PrintPanel(ScreenPanel):
             self.change_dir(None, "gcodes")
         self._refresh_files()
 
-    def add_directory(self, directory, show=True):
+    @staticmethod
+    def new_directory():
+        # The indexes hold the entries of a directory sorted by (key, fullpath, filename)
+        return {'directories': set(), 'files': {}, 'dir_index': [], 'file_index': [], 'modified': 0, 'size': 0}
+
+    def dir_item(self, directory):
+        key = self.filelist[directory]['modified'] if self.sort_current[0] == "date" else directory
+        return key, directory, None
+
+    def file_item(self, directory, filename):
+        key = self.filelist[directory]['files'][filename] if self.sort_current[0] == "date" else filename
+        return key, f"{directory}/{filename}"[7:], filename
+
+    def get_entry(self, directory, pos):
+        index = self.filelist[directory]['dir_index']
+        if pos >= len(index):
+            pos -= len(index)
+            index = self.filelist[directory]['file_index']
+        if self.sort_current[1] != 0:
+            pos = len(index) - 1 - pos
+        return index[pos][1:]
+
+    def count_entries(self, directory):
+        return len(self.filelist[directory]['dir_index']) + len(self.filelist[directory]['file_index'])
+
+    def index_entries(self):
+        for directory, entry in self.filelist.items():
+            entry['dir_index'] = sorted(self.dir_item(item) for item in entry['directories'])
+            entry['file_index'] = sorted(self.file_item(directory, item) for item in entry['files'])
+
+    def add_directory(self, directory, index=True):
         parent_dir = os.path.dirname(directory)
         if directory not in self.filelist:
-            self.filelist[directory] = {'directories': [], 'files': [], 'modified': 0}
-            self.filelist[parent_dir]['directories'].append(directory)
-
-        if directory not in self.labels['directories']:
-            self._create_row(directory)
-        reverse = self.sort_current[1] != 0
-        dirs = sorted(
-            self.filelist[parent_dir]['directories'],
-            reverse=reverse, key=lambda item: self.filelist[item]['modified']
-        ) if self.sort_current[0] == "date" else sorted(self.filelist[parent_dir]['directories'], reverse=reverse)
-
-        pos = dirs.index(directory)
-
-        self.dir_panels[parent_dir].insert_row(pos)
-        self.dir_panels[parent_dir].attach(self.directories[directory], 0, pos, 1, 1)
-        if show is True:
-            self.dir_panels[parent_dir].show_all()
-
-    def add_file(self, filepath, show=True):
+            self.filelist[directory] = self.new_directory()
+            self.filelist[parent_dir]['directories'].add(directory)
+            if index:
+                bisect.insort(self.filelist[parent_dir]['dir_index'], self.dir_item(directory))
+                self.update_rows(parent_dir)
+
+    def add_file(self, filepath, index=True):
+        # Without index only the model is filled, the caller indexes the entries afterwards
         fileinfo = self._screen.files.get_file_info(filepath)
         if fileinfo is None:
             return
@@ -122,40 +155,142 @@ class PrintPanel(ScreenPanel):
             if newdir not in self.filelist[curdir]['directories']:
                 if d[i].startswith("."):
                     return
-                self.add_directory(newdir)
+                self.add_directory(newdir, index)
 
         if filename not in self.filelist[directory]['files']:
             for i in range(1, len(d)):
                 curdir = os.path.join(*d[:i + 1])
                 if curdir != "gcodes" and fileinfo['modified'] > self.filelist[curdir]['modified']:
-                    self.filelist[curdir]['modified'] = fileinfo['modified']
-                    if self.time_24:
-                        time = f':<b>  {datetime.fromtimestamp(fileinfo["modified"]):%Y-%m-%d %H:%M}</b>'
-                    else:
-                        time = f':<b>  {datetime.fromtimestamp(fileinfo["modified"]):%Y-%m-%d %I:%M %p}</b>'
-                    info = _("Modified") + time
-                    info += "\n" + _("Size") + f':<b>  {self.format_size(fileinfo["size"])}</b>'
-                    self.labels['directories'][curdir]['info'].set_markup(info)
-            self.filelist[directory]['files'].append(filename)
+                    self.set_dir_modified(curdir, fileinfo, index)
+            self.filelist[directory]['files'][filename] = fileinfo['modified']
+            if index:
+                bisect.insort(self.filelist[directory]['file_index'], self.file_item(directory, filename))
+                self.update_rows(directory)
+        return False
 
-        if filepath not in self.files:
-            self._create_row(filepath, filename)
-        reverse = self.sort_current[1] != 0
-        files = sorted(
-            self.filelist[directory]['files'],
-            reverse=reverse,
-            key=lambda item: self._screen.files.get_file_info(f"{directory}/{item}"[7:])['modified']
-        ) if self.sort_current[0] == "date" else sorted(self.filelist[directory]['files'], reverse=reverse)
-
-        pos = files.index(filename)
-        pos += len(self.filelist[directory]['directories'])
-
-        self.dir_panels[directory].insert_row(pos)
-        self.dir_panels[directory].attach(self.files[filepath], 0, pos, 1, 1)
-        if show is True:
-            self.dir_panels[directory].show_all()
+    def set_dir_modified(self, directory, fileinfo, index=True):
+        parent_dir = os.path.dirname(directory)
+        if index:
+            dir_index = self.filelist[parent_dir]['dir_index']
+            del dir_index[bisect.bisect_left(dir_index, self.dir_item(directory))]
+        self.filelist[directory]['modified'] = fileinfo['modified']
+        self.filelist[directory]['size'] = fileinfo['size']
+        if index:
+            bisect.insort(dir_index, self.dir_item(directory))
+            if self.sort_current[0] == "date":
+                self.update_rows(parent_dir)
+        if directory in self.directories:
+            self.directories[directory]['info'].set_markup(self.get_dir_info_str(directory))
+
+    def update_rows(self, directory):
+        # Binds the rows again when the entries of the current directory change
+        if directory == self.cur_directory:
+            self.fill_view()
+
+    def get_row_height(self):
+        # Measured on the first rows that are allocated, until then the pool is kept small
+        if self.row_height <= 1:
+            heights = [row['row'].get_allocated_height() for row in self.rows if row['entry'] is not None]
+            self.row_height = sum(heights) / len(heights) if heights else 0
+        if self.row_height > 1:
+            return self.row_height
+        return max(self.scroll.get_vadjustment().get_page_size() / 4, 1)
+
+    def fill_view(self, *args):
+        # Binds the rows to the entries in the viewport and a page above and below it
+        if self.cur_directory not in self.filelist:
+            return
+        if self.reprioritize_id is None:
+            self.reprioritize_id = GLib.idle_add(self.reprioritize_thumbnails)
+        adjustment = self.scroll.get_vadjustment()
+        height = self.get_row_height()
+        count = self.count_entries(self.cur_directory)
+        size = min(count, int(adjustment.get_page_size() / height) + 1 + 2 * self.page_rows)
+        first = min(max(int(adjustment.get_value() / height) - self.page_rows, 0), count - size)
+        self.bind_rows(first, size)
+        self.spacers[0].set_size_request(-1, int(first * height))
+        self.spacers[1].set_size_request(-1, int((count - first - size) * height))
+
+    def reprioritize_thumbnails(self):
+        # Scheduled once for all the scroll events handled in the same main loop iteration
+        self.reprioritize_id = None
+        self._screen.thumbnail_loader.reprioritize(self, self.thumbnail_priority)
         return False
-    
+
+    def bind_rows(self, first, size):
+        entries = [self.get_entry(self.cur_directory, pos) for pos in range(first, first + size)]
+        wanted = set(entries)
+        bound = {row['entry']: row for row in self.rows if row['entry'] in wanted}
+        free = [row for row in self.rows if row['entry'] not in wanted]
+        rows = []
+        for entry in entries:
+            row = bound.get(entry)
+            if row is None:
+                row = free.pop() if free else self._create_row()
+                self.bind_row(row, entry)
+            rows.append(row)
+        for row in free:
+            if row['entry'] is not None:
+                self.bind_row(row, None)
+        if rows != self.rows[:len(rows)]:
+            for pos, row in enumerate(rows, start=1):
+                self.file_box.reorder_child(row['row'], pos)
+        self.rows = rows + free
+        self.first = first
+
+    def bind_row(self, row, entry):
+        if row['entry'] is not None:
+            fullpath, filename = row['entry']
+            (self.files if filename else self.directories).pop(fullpath, None)
+        row['entry'] = entry
+        if entry is None:
+            row['row'].hide()
+            return
+        fullpath, filename = entry
+        action_size = self._gtk.img_scale * self._gtk.button_image_scale * 1.5
+        if filename:
+            self.files[fullpath] = row
+            row['name'].set_markup(f'<big><b>{os.path.splitext(filename)[0].replace("_", " ")}</b></big>')
+            row['info'].set_markup(self.get_file_info_str(fullpath))
+            row['icon'].set_image(self.get_icon("file"))
+            row['action'].set_image(self.get_icon("print", action_size))
+            row['action'].set_visible(os.path.splitext(filename)[1] in [".gcode", ".g", ".gco"])
+            GLib.idle_add(self.image_load, fullpath)
+        else:
+            self.directories[fullpath] = row
+            row['name'].set_markup(f"<big><b>{os.path.split(fullpath)[-1]}</b></big>")
+            row['info'].set_markup(self.get_dir_info_str(fullpath))
+            row['icon'].set_image(self.get_icon("folder", action_size))
+            row['action'].set_image(self.get_icon("load", action_size))
+            row['action'].set_visible(True)
+        delete = "eject" if filename is None and self.is_media(fullpath) else "delete"
+        row['delete'].set_image(self.get_icon(delete, self._gtk.img_scale * self.bts * 1.5))
+        row['row'].show()
+
+    def get_icon(self, name, size=None):
+        # The pixbufs are shared by the rows, so binding a row doesn't read the theme again
+        if (name, size) not in self.icons:
+            self.icons[(name, size)] = self._gtk.PixbufFromIcon(name, size, size)
+        pixbuf = self.icons[(name, size)]
+        return Gtk.Image.new_from_pixbuf(pixbuf) if pixbuf is not None else Gtk.Image()
+
+    def clear_rows(self):
+        self._screen.thumbnail_loader.cancel(self)
+        for row in self.rows:
+            if row['entry'] is not None:
+                self.bind_row(row, None)
+        self.files = {}
+        self.directories = {}
+        self.first = 0
+        self.row_height = 0
+        for spacer in self.spacers:
+            spacer.set_size_request(-1, 0)
+
+    def is_media(self, directory):
+        if directory not in self.media:
+            self.media[directory] = self.is_usb_media(directory)
+        return self.media[directory]
+
     def is_usb_media(self, fullpath):
         fullpath = "/home/pi/printer_data/" + fullpath
         if not os.path.exists(fullpath):
@@ -186,14 +321,9 @@ class PrintPanel(ScreenPanel):
                 else:
                     logging.error("can't eject the USB")
 
-    def _create_row(self, fullpath, filename=None):
-        logging.info(f'new row: fp: {fullpath} - fn: {filename}')
+    def _create_row(self):
         name = Gtk.Label()
         name.get_style_context().add_class("print-filename")
-        if filename:
-            name.set_markup(f'<big><b>{os.path.splitext(filename)[0].replace("_", " ")}</b></big>')
-        else:
-            name.set_markup(f"<big><b>{os.path.split(fullpath)[-1]}</b></big>")
         name.set_hexpand(True)
         name.set_halign(Gtk.Align.START)
         name.set_line_wrap(True)
@@ -204,75 +334,96 @@ class PrintPanel(ScreenPanel):
         info.set_halign(Gtk.Align.START)
         info.get_style_context().add_class("print-info")
 
-        is_media = self.is_usb_media(fullpath)
-        if is_media:
-            delete = self._gtk.Button("eject", style="color1", scale=self.bts)
-        else:
-            delete = self._gtk.Button("delete", style="color1", scale=self.bts)
+        icon = self._gtk.Button("folder")
+        icon.set_hexpand(False)
+        delete = self._gtk.Button("delete", style="color1", scale=self.bts)
         delete.set_hexpand(False)
         rename = self._gtk.Button("files", style="color2", scale=self.bts)
         rename.set_hexpand(False)
-
-        if filename:
-            action = self._gtk.Button("print", style="color3")
-            action.connect("clicked", self.confirm_print, fullpath)
-            info.set_markup(self.get_file_info_str(fullpath))
-            icon = Gtk.Button()
-            icon.connect("clicked", self.confirm_print, fullpath)
-            delete.connect("clicked", self.confirm_delete_file, f"gcodes/{fullpath}")
-            rename.connect("clicked", self.show_rename, f"gcodes/{fullpath}")
-            GLib.idle_add(self.image_load, fullpath)
-        else:
-            action = self._gtk.Button("load", style="color3")
-            action.connect("clicked", self.change_dir, fullpath)
-            icon = self._gtk.Button("folder")
-            icon.connect("clicked", self.change_dir, fullpath)
-            if is_media:
-                delete.connect("clicked", self.confirm_umount, fullpath)
-            else:
-                delete.connect("clicked", self.confirm_delete_directory, fullpath)
-            rename.connect("clicked", self.show_rename, fullpath)
-        icon.set_hexpand(False)
+        action = self._gtk.Button("print", style="color3")
         action.set_hexpand(False)
         action.set_halign(Gtk.Align.END)
+        action.set_no_show_all(True)
 
-        # delete.connect("clicked", self.confirm_delete_file, f"gcodes/{fullpath}")
-
-        row = Gtk.Grid()
-        row.get_style_context().add_class("frame-item")
-        row.set_hexpand(True)
-        row.set_vexpand(False)
-        row.attach(icon, 0, 0, 1, 2)
-        row.attach(name, 1, 0, 3, 1)
-        row.attach(info, 1, 1, 1, 1)
-        row.attach(rename, 2, 1, 1, 1)
-        row.attach(delete, 3, 1, 1, 1)
-
-        if not filename or (filename and os.path.splitext(filename)[1] in [".gcode", ".g", ".gco"]):
-            row.attach(action, 4, 0, 1, 2)
+        grid = Gtk.Grid()
+        grid.get_style_context().add_class("frame-item")
+        grid.set_hexpand(True)
+        grid.set_vexpand(False)
+        grid.attach(icon, 0, 0, 1, 2)
+        grid.attach(name, 1, 0, 3, 1)
+        grid.attach(info, 1, 1, 1, 1)
+        grid.attach(rename, 2, 1, 1, 1)
+        grid.attach(delete, 3, 1, 1, 1)
+        grid.attach(action, 4, 0, 1, 2)
+        grid.show_all()
+        # The visibility of the row follows its binding
+        grid.set_no_show_all(True)
+        grid.hide()
+        self.file_box.pack_start(grid, False, False, 0)
+        self.file_box.reorder_child(self.spacers[1], -1)
+
+        row = {
+            "row": grid,
+            "icon": icon,
+            "name": name,
+            "info": info,
+            "delete": delete,
+            "action": action,
+            "entry": None
+        }
+        icon.connect("clicked", self.open_entry, row)
+        action.connect("clicked", self.open_entry, row)
+        delete.connect("clicked", self.delete_entry, row)
+        rename.connect("clicked", self.rename_entry, row)
+        return row
+
+    def open_entry(self, widget, row):
+        fullpath, filename = row['entry']
+        if filename:
+            self.confirm_print(widget, fullpath)
+        else:
+            self.change_dir(widget, fullpath)
 
-        if filename is not None:
-            self.files[fullpath] = row
-            self.labels['files'][fullpath] = {
-                "icon": icon,
-                "info": info,
-                "name": name
-            }
+    def delete_entry(self, widget, row):
+        fullpath, filename = row['entry']
+        if filename:
+            self.confirm_delete_file(widget, f"gcodes/{fullpath}")
+        elif self.is_media(fullpath):
+            self.confirm_umount(widget, fullpath)
         else:
-            self.directories[fullpath] = row
-            self.labels['directories'][fullpath] = {
-                "info": info,
-                "name": name
-            }
-            self.dir_panels[fullpath] = Gtk.Grid()
+            self.confirm_delete_directory(widget, fullpath)
+
+    def rename_entry(self, widget, row):
+        fullpath, filename = row['entry']
+        self.show_rename(widget, f"gcodes/{fullpath}" if filename else fullpath)
 
     def image_load(self, filepath):
-        pixbuf = self.get_file_image(filepath, small=True)
+        if filepath not in self.files:
+            return False
+        self.get_file_image(filepath, lambda pixbuf: self.set_file_image(filepath, pixbuf), small=True,
+                            priority=self.thumbnail_priority(filepath), group=self)
+        return False
+
+    def thumbnail_priority(self, filepath):
+        # Thumbnails of the rows in the viewport are loaded first, then the closest ones
+        if filepath not in self.files:
+            return float("inf")
+        pos = self.first + self.rows.index(self.files[filepath])
+        adjustment = self.scroll.get_vadjustment()
+        row_height = self.get_row_height()
+        first = adjustment.get_value() / row_height
+        last = first + adjustment.get_page_size() / row_height
+        if first - 1 <= pos <= last:
+            return 0
+        return min(abs(pos - first), abs(pos - last))
+
+    def set_file_image(self, filepath, pixbuf):
+        if filepath not in self.files:
+            return
         if pixbuf is not None:
-            self.labels['files'][filepath]['icon'].set_image(Gtk.Image.new_from_pixbuf(pixbuf))
+            self.files[filepath]['icon'].set_image(Gtk.Image.new_from_pixbuf(pixbuf))
         else:
-            self.labels['files'][filepath]['icon'].set_image(self._gtk.Image("file"))
-        return False
+            self.files[filepath]['icon'].set_image(self.get_icon("file"))
 
     def confirm_delete_file(self, widget, filepath):
         logging.debug(f"Sending delete_file {filepath}")
@@ -304,16 +455,16 @@ class PrintPanel(ScreenPanel):
         return False
 
     def change_dir(self, widget, directory):
-        if directory not in self.dir_panels:
+        if directory not in self.filelist:
             return
         logging.debug(f"Changing dir to {directory}")
 
-        for child in self.scroll.get_children():
-            self.scroll.remove(child)
+        self.clear_rows()
         self.cur_directory = directory
         self.labels['path'].set_text(f"  {self.cur_directory[7:]}")
 
-        self.scroll.add(self.dir_panels[directory])
+        self.scroll.get_vadjustment().set_value(0)
+        self.fill_view()
         self.content.show_all()
 
     def change_sort(self, widget, key):
@@ -328,7 +479,8 @@ class PrintPanel(ScreenPanel):
         self.labels[f'sort_{key}'].set_image(self._gtk.Image(self.sort_icon[self.sort_current[1]],
                                                              self._gtk.img_scale * self.bts))
         self.labels[f'sort_{key}'].show()
-        GLib.idle_add(self.reload_files)
+        self.index_entries()
+        self.fill_view()
 
         self._config.set("main", "print_sort_dir", f'{key}_{"asc" if self.sort_current[1] == 0 else "desc"}')
         self._config.save_user_config_options()
@@ -355,14 +507,27 @@ class PrintPanel(ScreenPanel):
         grid.set_valign(Gtk.Align.CENTER)
         grid.attach(label, 0, 0, 1, 1)
 
-        pixbuf = self.get_file_image(filename, self._screen.width * .9, self._screen.height * .6)
-        if pixbuf is not None:
-            image = Gtk.Image.new_from_pixbuf(pixbuf)
-            image.set_vexpand(False)
-            grid.attach(image, 0, 1, 1, 1)
+        dialog = self._gtk.Dialog(self._screen, buttons, grid, self.confirm_print_response, filename)
+        dialog.set_title(_("Print"))
+
+        # The image and the filament usage are added to the dialog when they are loaded
+        self.get_file_image(filename, lambda pixbuf: self.confirm_print_image(grid, pixbuf),
+                            self._screen.width * .9, self._screen.height * .6)
+        if self._printer.has_scales():
+            self._screen.apiclient.send_request_async(f"server/files/metadata?filename={filename}",
+                                                      self.confirm_print_usage, grid)
+
+    @staticmethod
+    def confirm_print_image(grid, pixbuf):
+        if pixbuf is None or grid.get_parent() is None:
+            return
+        image = Gtk.Image.new_from_pixbuf(pixbuf)
+        image.set_vexpand(False)
+        grid.attach(image, 0, 1, 1, 1)
+        image.show()
 
-        metadata_response = self._screen.apiclient.send_request(f"server/files/metadata?filename={filename}")
-        if metadata_response and self._printer.has_scales():
+    def confirm_print_usage(self, metadata_response, grid):
+        if metadata_response and grid.get_parent() is not None:
             metadata = metadata_response['result']
             if "filament_weight_total" in metadata and "estimated_time" in metadata:
                 checkgrid = Gtk.Grid()
@@ -417,9 +582,7 @@ class PrintPanel(ScreenPanel):
                 box = Gtk.Box(orientation=Gtk.Orientation.VERTICAL, spacing=5)
                 box.add(checkgrid)
                 grid.attach(box, 1, 0, 1, 2)
-
-        dialog = self._gtk.Dialog(self._screen, buttons, grid, self.confirm_print_response, filename)
-        dialog.set_title(_("Print"))
+                box.show_all()
 
     def seconds_to_time(self, seconds):
         hours = int(seconds / 3600)
@@ -436,37 +599,34 @@ class PrintPanel(ScreenPanel):
 
     def delete_file(self, filename):
         directory = os.path.join("gcodes", os.path.dirname(filename)) if os.path.dirname(filename) else "gcodes"
-        if directory not in self.filelist or os.path.basename(filename).startswith("."):
+        basename = os.path.basename(filename)
+        if directory not in self.filelist or basename.startswith("."):
             return
-        try:
-            self.filelist[directory]["files"].pop(self.filelist[directory]["files"].index(os.path.basename(filename)))
-        except Exception as e:
-            logging.exception(e)
+        if basename in self.filelist[directory]['files']:
+            index = self.filelist[directory]['file_index']
+            del index[bisect.bisect_left(index, self.file_item(directory, basename))]
+            del self.filelist[directory]['files'][basename]
+        else:
+            logging.error(f"Cannot delete file, file not in list: {filename}")
         dir_parts = directory.split(os.sep)
         i = len(dir_parts)
         while i > 1:
             cur_dir = os.path.join(*dir_parts[:i])
-            if len(self.filelist[cur_dir]['directories']) > 0 or len(self.filelist[cur_dir]['files']) > 0:
+            if self.filelist[cur_dir]['directories'] or self.filelist[cur_dir]['files']:
                 break
             parent_dir = os.path.dirname(cur_dir)
 
             if self.cur_directory == cur_dir:
                 self.change_dir(None, parent_dir)
 
+            index = self.filelist[parent_dir]['dir_index']
+            del index[bisect.bisect_left(index, self.dir_item(cur_dir))]
+            self.filelist[parent_dir]['directories'].discard(cur_dir)
             del self.filelist[cur_dir]
-            self.filelist[parent_dir]['directories'].pop(self.filelist[parent_dir]['directories'].index(cur_dir))
-            self.dir_panels[parent_dir].remove(self.directories[cur_dir])
-            del self.directories[cur_dir]
-            del self.labels['directories'][cur_dir]
-            self.dir_panels[parent_dir].show_all()
+            self.media.pop(cur_dir, None)
             i -= 1
 
-        try:
-            self.dir_panels[directory].remove(self.files[filename])
-        except Exception as e:
-            logging.exception(e)
-        self.dir_panels[directory].show_all()
-        self.files.pop(filename)
+        self.fill_view()
 
     def get_file_info_str(self, filename):
 
@@ -485,24 +645,41 @@ class PrintPanel(ScreenPanel):
             info += _("Print Time") + f':  <b>{self.format_time(fileinfo["estimated_time"])}</b>'
         return info
 
+    def get_dir_info_str(self, directory):
+        modified = self.filelist[directory]['modified']
+        if not modified:
+            return ""
+        if self.time_24:
+            time = f':<b>  {datetime.fromtimestamp(modified):%Y-%m-%d %H:%M}</b>'
+        else:
+            time = f':<b>  {datetime.fromtimestamp(modified):%Y-%m-%d %I:%M %p}</b>'
+        info = _("Modified") + time
+        info += "\n" + _("Size") + f':<b>  {self.format_size(self.filelist[directory]["size"])}</b>'
+        return info
+
     def reload_files(self, widget=None):
-        self.filelist = {'gcodes': {'directories': [], 'files': []}}
-        for dirpan in self.dir_panels:
-            for child in self.dir_panels[dirpan].get_children():
-                self.dir_panels[dirpan].remove(child)
+        self.filelist = {'gcodes': self.new_directory()}
+        self.media = {}
+        self.clear_rows()
 
+        # The entries are indexed once after the model is filled, the rows are bound by fill_view
         flist = sorted(self._screen.files.get_file_list(), key=lambda item: '/' in item)
         for file in flist:
-            GLib.idle_add(self.add_file, file)
+            self.add_file(file, index=False)
+        self.index_entries()
+        if self.cur_directory not in self.filelist:
+            self.cur_directory = "gcodes"
+            self.labels['path'].set_text("")
+        self.fill_view()
         return False
 
     def update_file(self, filename):
-        if filename not in self.labels['files']:
-            logging.debug(f"Cannot update file, file not in labels: {filename}")
+        if filename not in self.files:
+            logging.debug(f"Cannot update file, file not shown: {filename}")
             return
 
         logging.info(f"Updating file {filename}")
-        self.labels['files'][filename]['info'].set_markup(self.get_file_info_str(filename))
+        self.files[filename]['info'].set_markup(self.get_file_info_str(filename))
 
         # Update icon
         GLib.idle_add(self.image_load, filename)
@@ -52,40 +52,12 @@ class SystemPanel(ScreenPanel):
         scroll = self._gtk.ScrolledWindow()
         scroll.set_policy(Gtk.PolicyType.NEVER, Gtk.PolicyType.AUTOMATIC)
 
-        infogrid = Gtk.Grid()
-        infogrid.get_style_context().add_class("system-program-grid")
-        update_resp = self._screen.apiclient.send_request("machine/update/status")
+        self.update_status = {}
+        self.infogrid = Gtk.Grid()
+        self.program_rows = 0
+        self.infogrid.get_style_context().add_class("system-program-grid")
 
-        if not update_resp:
-            self.update_status = {}
-            logging.info("No update manager configured")
-        else:
-            self.update_status = update_resp['result']
-            vi = update_resp['result']['version_info']
-            items = sorted(list(vi))
-            i = 0
-            for prog in items:
-                self.labels[prog] = Gtk.Label("")
-                self.labels[prog].set_hexpand(True)
-                self.labels[prog].set_halign(Gtk.Align.START)
-
-                self.labels[f"{prog}_status"] = self._gtk.Button()
-                self.labels[f"{prog}_status"].set_hexpand(False)
-                self.labels[f"{prog}_status"].connect("clicked", self.show_update_info, prog)
-
-                if prog in ALLOWED_SERVICES:
-                    self.labels[f"{prog}_restart"] = self._gtk.Button("refresh", scale=.7)
-                    self.labels[f"{prog}_restart"].connect("clicked", self.restart, prog)
-                    infogrid.attach(self.labels[f"{prog}_restart"], 0, i, 1, 1)
-
-                infogrid.attach(self.labels[f"{prog}_status"], 2, i, 1, 1)
-                self.update_program_info(prog)
-
-                infogrid.attach(self.labels[prog], 1, i, 1, 1)
-                self.labels[prog].get_style_context().add_class('updater-item')
-                i = i + 1
-
-        scroll.add(infogrid)
+        scroll.add(self.infogrid)
 
         grid.attach(scroll, 0, 0, 4, 2)
         grid.attach(update_all, 0, 2, 1, 1)
@@ -103,7 +75,10 @@ class SystemPanel(ScreenPanel):
         GLib.timeout_add_seconds(1, self.get_updates, "true")
 
     def get_updates(self, refresh="false"):
-        update_resp = self._screen.apiclient.send_request(f"machine/update/status?refresh={refresh}")
+        self._screen.apiclient.send_request_async(f"machine/update/status?refresh={refresh}", self.process_updates)
+        return False
+
+    def process_updates(self, update_resp):
         if not update_resp:
             self.update_status = {}
             logging.info("No update manager configured")
@@ -112,10 +87,33 @@ class SystemPanel(ScreenPanel):
             vi = update_resp['result']['version_info']
             items = sorted(list(vi))
             for prog in items:
+                if prog not in self.labels:
+                    self.add_program(prog)
                 self.update_program_info(prog)
+            self.infogrid.show_all()
         self.refresh.set_sensitive(True)
         self._screen.close_popup_message()
 
+    def add_program(self, prog):
+        i = self.program_rows
+        self.program_rows += 1
+        self.labels[prog] = Gtk.Label("")
+        self.labels[prog].set_hexpand(True)
+        self.labels[prog].set_halign(Gtk.Align.START)
+
+        self.labels[f"{prog}_status"] = self._gtk.Button()
+        self.labels[f"{prog}_status"].set_hexpand(False)
+        self.labels[f"{prog}_status"].connect("clicked", self.show_update_info, prog)
+
+        if prog in ALLOWED_SERVICES:
+            self.labels[f"{prog}_restart"] = self._gtk.Button("refresh", scale=.7)
+            self.labels[f"{prog}_restart"].connect("clicked", self.restart, prog)
+            self.infogrid.attach(self.labels[f"{prog}_restart"], 0, i, 1, 1)
+
+        self.infogrid.attach(self.labels[f"{prog}_status"], 2, i, 1, 1)
+        self.infogrid.attach(self.labels[prog], 1, i, 1, 1)
+        self.labels[prog].get_style_context().add_class('updater-item')
+
     def restart(self, widget, program):
         if program not in ALLOWED_SERVICES:
             return
@@ -195,8 +195,8 @@ class TemperaturePanel(ScreenPanel):
             self.labels['da'].queue_draw()
             self.labels['da'].show()
             if self.graph_update is None:
-                # This has a high impact on load
-                self.graph_update = GLib.timeout_add_seconds(5, self.update_graph)
+                # Only the newest samples are drawn on each update
+                self.graph_update = GLib.timeout_add_seconds(1, self.update_graph)
         elif self.labels['da'] in self.left_panel:
             self.left_panel.remove(self.labels['da'])
             if self.graph_update is not None:
@@ -534,5 +534,5 @@ class TemperaturePanel(ScreenPanel):
         self.labels['popover'].popdown()
 
     def update_graph(self):
-        self.labels['da'].queue_draw()
+        self.labels['da'].update()
         return True
@@ -1,7 +1,6 @@
 #!/usr/bin/python
 
 import argparse
-import json
 import logging
 import os
 import subprocess
@@ -13,6 +12,7 @@ import gi
 
 gi.require_version("Gtk", "3.0")
 from gi.repository import Gtk, Gdk, GLib, Pango
+from collections import OrderedDict
 from importlib import import_module
 from jinja2 import Environment
 from signal import SIGTERM
@@ -23,31 +23,19 @@ from ks_includes.KlippyRest import KlippyRest
 from ks_includes.files import KlippyFiles
 from ks_includes.KlippyGtk import KlippyGtk
 from ks_includes.printer import Printer
+from ks_includes.printer_cache import PrinterCache
+from ks_includes.panel_preloader import PanelPreloader
+from ks_includes.profiler import profiler
+from ks_includes.style_cache import StyleCache
+from ks_includes.thumbnail_cache import ThumbnailCache
+from ks_includes.thumbnail_loader import ThumbnailLoader
 from ks_includes.widgets.keyboard import Keyboard
 from ks_includes.config import KlipperScreenConfig
+from ks_includes.update_dispatcher import UpdateDispatcher
 from panels.base_panel import BasePanel
 
 logging.getLogger("urllib3").setLevel(logging.WARNING)
 
-PRINTER_BASE_STATUS_OBJECTS = [
-    'bed_mesh',
-    'configfile',
-    'display_status',
-    'extruder',
-    'fan',
-    'gcode_move',
-    'heater_bed',
-    'idle_timeout',
-    'pause_resume',
-    'print_stats',
-    'toolhead',
-    'virtual_sdcard',
-    'webhooks',
-    'motion_report',
-    'firmware_retraction',
-    'exclude_object',
-]
-
 klipperscreendir = pathlib.Path(__file__).parent.resolve()
 
 
@@ -92,6 +80,8 @@ class KlipperScreen(Gtk.Window):
     max_retries = 4
     initialized = initializing = False
     popup_timeout = None
+    # Compiled menu, enable and title templates
+    max_templates = 256
 
     def __init__(self, args, version):
         try:
@@ -102,16 +92,23 @@ class KlipperScreen(Gtk.Window):
         self.blanking_time = 600
         self.use_dpms = True
         self.apiclient = None
+        self.printer_cache = PrinterCache()
+        self.style_cache = StyleCache()
+        self.style_provider = None
+        self.thumbnails = ThumbnailCache()
+        self.thumbnail_loader = ThumbnailLoader(self, self.thumbnails)
         self.version = version
         self.dialogs = []
         self.confirm = None
 
         configfile = os.path.normpath(os.path.expanduser(args.configfile))
 
-        self._config = KlipperScreenConfig(configfile, self)
+        with profiler.phase("KlipperScreenConfig"):
+            self._config = KlipperScreenConfig(configfile, self)
         self.lang_ltr = set_text_direction(self._config.get_main_config().get("language", None))
         self.env = Environment(extensions=["jinja2.ext.i18n"], autoescape=True)
         self.env.install_gettext_translations(self._config.get_lang())
+        self.templates = OrderedDict()
 
         self.connect("key-press-event", self._key_press_event)
         self.connect("configure_event", self.update_size)
@@ -132,10 +129,15 @@ class KlipperScreen(Gtk.Window):
         self.theme = self._config.get_main_config().get('theme')
         self.show_cursor = self._config.get_main_config().getboolean("show_cursor", fallback=False)
         self.gtk = KlippyGtk(self)
-        self.init_style()
+        self.dispatcher = UpdateDispatcher(
+            self, self._dispatch_update, self._config.get_main_config().getfloat("status_update_rate", 0))
+        self.preloader = PanelPreloader(self, self._config.get_main_config().getint("preload_panels", 3))
+        with profiler.phase("init_style"):
+            self.init_style()
         self.set_icon_from_file(os.path.join(klipperscreendir, "styles", "icon.svg"))
 
-        self.base_panel = BasePanel(self, title="Base Panel")
+        with profiler.phase("BasePanel"):
+            self.base_panel = BasePanel(self, title="Base Panel")
         self.add(self.base_panel.main_grid)
         self.show_all()
         if self.show_cursor:
@@ -153,7 +155,8 @@ class KlipperScreen(Gtk.Window):
             self.dialogs = []
         self.set_screenblanking_timeout(self._config.get_main_config().get('screen_blanking'))
 
-        self.initial_connection()
+        with profiler.phase("initial_connection"):
+            self.initial_connection()
 
     def initial_connection(self):
         self.printers = self._config.get_printers()
@@ -179,6 +182,7 @@ class KlipperScreen(Gtk.Window):
             self.base_panel.show_printer_select(True)
             self.show_printer_select()
 
+    @profiler.phase("connect_printer")
     def connect_printer(self, name):
         self.connecting_to_printer = name
         if self._ws is not None and self._ws.connected:
@@ -191,6 +195,8 @@ class KlipperScreen(Gtk.Window):
 
         self.connecting = True
         self.initialized = False
+        self.dispatcher.clear()
+        self.preloader.clear()
 
         ind = 0
         logging.info(f"Connecting to printer: {name}")
@@ -200,6 +206,8 @@ class KlipperScreen(Gtk.Window):
                 break
 
         self.printer = self.printers[ind]["data"]
+        if self.apiclient is not None:
+            self.apiclient.close()
         self.apiclient = KlippyRest(
             self.printers[ind][name]["moonraker_host"],
             self.printers[ind][name]["moonraker_port"],
@@ -212,6 +220,7 @@ class KlipperScreen(Gtk.Window):
                                    {
                                        "on_connect": self.init_printer,
                                        "on_message": self._websocket_callback,
+                                       "on_status_update": self._websocket_status_update,
                                        "on_close": self.websocket_disconnected
                                    },
                                    self.printers[ind][name]["moonraker_host"],
@@ -219,28 +228,44 @@ class KlipperScreen(Gtk.Window):
                                    )
 
         self.files = KlippyFiles(self)
+        self.warm_start(name)
         self._ws.initial_connect()
 
-    def ws_subscribe(self):
+    def warm_start(self, name):
+        # Shows the menus from the cache while connecting for the first time,
+        # they are read-only until they are rebuilt when the printer is ready
+        if self.printer.config:
+            return
+        cached = self.printer_cache.load(name)
+        if cached is None:
+            return
+        logging.info("Using the cached printer config until the printer is ready")
+        self.printer.reinit(cached['printer_info'], cached['status'])
+        if cached['power_devices'] is not None:
+            self.printer.configure_power_devices(cached['power_devices'])
+        self.base_panel.set_ks_printer_cfg(name)
+        self.state_ready(wait=False)
+        self.base_panel.set_read_only(True)
+
+    def ws_subscribe(self, callback=None, *args, handler=None):
         requested_updates = {
             "objects": {
                 "bed_mesh": ["profile_name", "mesh_max", "mesh_min", "probed_matrix", "profiles"],
-                "configfile": ["config"],
                 "display_status": ["progress", "message"],
                 "fan": ["speed"],
-                "gcode_move": ["extrude_factor", "gcode_position", "homing_origin", "speed_factor", "speed"],
+                "gcode_move": ["absolute_coordinates", "extrude_factor", "gcode_position", "homing_origin",
+                               "speed_factor", "speed"],
                 "idle_timeout": ["state"],
                 "pause_resume": ["is_paused"],
                 "print_stats": ["print_duration", "total_duration", "filament_used", "filename", "state", "message",
                                 "info"],
                 "toolhead": ["homed_axes", "estimated_print_time", "print_time", "position", "extruder",
                              "max_accel", "max_accel_to_decel", "max_velocity", "square_corner_velocity"],
-                "virtual_sdcard": ["file_position", "is_active", "progress"],
+                "virtual_sdcard": ["file_position", "is_active", "progress", "can_resurrect"],
                 "webhooks": ["state", "state_message"],
                 "firmware_retraction": ["retract_length", "retract_speed", "unretract_extra_length", "unretract_speed"],
                 "motion_report": ["live_position", "live_velocity", "live_extruder_velocity"],
                 "exclude_object": ["current_object", "objects", "excluded_objects"],
-                "virtual_sdcard": ["can_resurrect"]
             }
         }
         for extruder in self.printer.get_tools():
@@ -259,7 +284,7 @@ class KlipperScreen(Gtk.Window):
         for macro in self.printer.get_config_section_list("gcode_macro "):
             requested_updates['objects'][macro] = ["running"]
 
-        self._ws.klippy.object_subscription(requested_updates)
+        return self._ws.klippy.object_subscription(requested_updates, callback, *args, handler=handler)
 
     def _load_panel(self, panel, *args, **kwargs):
         if panel not in self.load_panel:
@@ -270,13 +295,15 @@ class KlipperScreen(Gtk.Window):
                 logging.error(f"Panel {panel} does not exist")
                 raise FileNotFoundError(os.strerror(2), "\n" + panel_path)
 
-            module = import_module(f"panels.{panel}")
+            with profiler.phase(f"Import {panel}", "panels"):
+                module = import_module(f"panels.{panel}")
             if not hasattr(module, "create_panel"):
                 raise ImportError(f"Cannot locate create_panel function for {panel}")
             self.load_panel[panel] = getattr(module, "create_panel")
 
         try:
-            return self.load_panel[panel](*args, **kwargs)
+            with profiler.phase(f"Create {panel}", "panels"):
+                return self.load_panel[panel](*args, **kwargs)
         except Exception as e:
             logging.exception(e)
             raise RuntimeError(f"Unable to create panel: {panel}\n{e}") from e
@@ -290,7 +317,8 @@ class KlipperScreen(Gtk.Window):
 
             if panel_name not in self.panels:
                 try:
-                    self.panels[panel_name] = self._load_panel(panel_type, self, title, **kwargs)
+                    self.panels[panel_name] = (self.preloader.take(panel_name, panel_type, kwargs)
+                                               or self._load_panel(panel_type, self, title, **kwargs))
                 except Exception as e:
                     if panel_name in self.panels:
                         del self.panels[panel_name]
@@ -388,9 +416,9 @@ class KlipperScreen(Gtk.Window):
     def _send_dialog_response(self, dialog, response_id):
         self.gtk.remove_dialog(dialog)
         if response_id == Gtk.ResponseType.OK:
-            self.apiclient.send_request("printer/dialogs/ack")
+            self.apiclient.send_request_async("printer/dialogs/ack")
         elif response_id == Gtk.ResponseType.CANCEL:
-            self.apiclient.send_request("printer/dialogs/abort")
+            self.apiclient.send_request_async("printer/dialogs/abort")
 
     def show_error_modal(self, err, e=""):
         logging.error(f"Showing error modal: {err} {e}")
@@ -441,57 +469,17 @@ class KlipperScreen(Gtk.Window):
         settings = Gtk.Settings.get_default()
         settings.set_property("gtk-theme-name", "Adwaita")
         settings.set_property("gtk-application-prefer-dark-theme", False)
-        css_data = pathlib.Path(os.path.join(klipperscreendir, "styles", "base.css")).read_text()
-
-        with open(os.path.join(klipperscreendir, "styles", "base.conf")) as f:
-            style_options = json.load(f)
-        # Load custom theme
-        theme = os.path.join(klipperscreendir, "styles", self.theme)
-        theme_style = os.path.join(theme, "style.css")
-        theme_style_conf = os.path.join(theme, "style.conf")
-
-        if os.path.exists(theme_style):
-            with open(theme_style) as css:
-                css_data += css.read()
-        if os.path.exists(theme_style_conf):
-            try:
-                with open(theme_style_conf) as f:
-                    style_options.update(json.load(f))
-            except Exception as e:
-                logging.error(f"Unable to parse custom template conf file:\n{e}")
-
-        self.gtk.color_list = style_options['graph_colors']
-
-        for i in range(len(style_options['graph_colors']['extruder']['colors'])):
-            num = "" if i == 0 else i
-            css_data += "\n.graph_label_extruder%s {border-left-color: #%s}" % (
-                num,
-                style_options['graph_colors']['extruder']['colors'][i]
-            )
-        for i in range(len(style_options['graph_colors']['bed']['colors'])):
-            css_data += "\n.graph_label_heater_bed%s {border-left-color: #%s}" % (
-                "" if i == 0 else i + 1,
-                style_options['graph_colors']['bed']['colors'][i]
-            )
-        for i in range(len(style_options['graph_colors']['fan']['colors'])):
-            css_data += "\n.graph_label_fan_%s {border-left-color: #%s}" % (
-                i + 1,
-                style_options['graph_colors']['fan']['colors'][i]
-            )
-        for i in range(len(style_options['graph_colors']['sensor']['colors'])):
-            css_data += "\n.graph_label_sensor_%s {border-left-color: #%s}" % (
-                i + 1,
-                style_options['graph_colors']['sensor']['colors'][i]
-            )
-
-        css_data = css_data.replace("KS_FONT_SIZE", f"{self.gtk.font_size}")
-
-        style_provider = Gtk.CssProvider()
-        style_provider.load_from_data(css_data.encode())
+        css_data, self.gtk.color_list = self.style_cache.load(self.theme, self.gtk.font_size)
+
+        # Replaces the previous stylesheet when the style is reloaded
+        if self.style_provider is not None:
+            Gtk.StyleContext.remove_provider_for_screen(Gdk.Screen.get_default(), self.style_provider)
+        self.style_provider = Gtk.CssProvider()
+        self.style_provider.load_from_data(css_data.encode())
 
         Gtk.StyleContext.add_provider_for_screen(
             Gdk.Screen.get_default(),
-            style_provider,
+            self.style_provider,
             Gtk.STYLE_PROVIDER_PRIORITY_APPLICATION
         )
 
@@ -713,6 +701,7 @@ class KlipperScreen(Gtk.Window):
             return
         self.show_panel('main_panel', "main_menu", None, 2, items=self._config.get_menu_items("__main"))
         self.base_panel_show_all()
+        self.preloader.schedule()
 
     def state_startup(self):
         self.printer_initializing(_("Klipper is attempting to start"))
@@ -738,6 +727,7 @@ class KlipperScreen(Gtk.Window):
             self.show_printer_select()
             return
         self._remove_all_panels()
+        self.preloader.clear()
         if self.printer is not None:
             self.printer.change_state(self.printer.state)
 
@@ -751,8 +741,6 @@ class KlipperScreen(Gtk.Window):
             self.printer.process_update({'webhooks': {'state': "shutdown"}})
         elif action == "notify_klippy_ready":
             self.printer.process_update({'webhooks': {'state': "ready"}})
-        elif action == "notify_status_update" and self.printer.state != "shutdown":
-            self.printer.process_update(data)
         elif action == "notify_filelist_changed":
             if self.files is not None:
                 self.files.process_update(data)
@@ -793,10 +781,42 @@ class KlipperScreen(Gtk.Window):
                     )
         self.process_update(action, data)
 
-    def process_update(self, *args):
-        GLib.idle_add(self.base_panel.process_update, *args)
-        for x in self.subscriptions:
-            GLib.idle_add(self.panels[x].process_update, *args)
+    def _websocket_status_update(self, data):
+        # This runs in the websocket thread, the main loop only receives the values that changed
+        if self.connecting or self.printer.state == "shutdown":
+            return
+        changed = self.printer.process_update(data)
+        if changed:
+            GLib.idle_add(self.process_update, "notify_status_update", changed)
+
+    def process_update(self, action, data):
+        if action == "notify_status_update":
+            self.dispatcher.push(data)
+            return
+        if self.dispatcher.pending:
+            # Deliver the merged status first to keep the ordering of events
+            GLib.idle_add(self.dispatcher.flush)
+        GLib.idle_add(self._dispatch_update, action, data)
+
+    def _dispatch_update(self, action, data):
+        if action == "notify_status_update" and self.printer is not None:
+            self.printer.notify_listeners(data)
+        for panel in [self.base_panel] + [self.panels[x] for x in list(self.subscriptions) if x in self.panels]:
+            try:
+                panel.process_update(action, data)
+            except Exception as e:
+                logging.exception(f"Error processing {action} in {panel.title}:\n{e}")
+        return False
+
+    def get_template(self, source):
+        # Templates read the translations from the environment when rendering, so they stay valid
+        if source in self.templates:
+            self.templates.move_to_end(source)
+            return self.templates[source]
+        self.templates[source] = self.env.from_string(source)
+        if len(self.templates) > self.max_templates:
+            self.templates.popitem(last=False)
+        return self.templates[source]
 
     def _confirm_send_action(self, widget, text, method, params=None):
         buttons = [
@@ -868,6 +888,7 @@ class KlipperScreen(Gtk.Window):
 
     def printer_initializing(self, msg, remove=False):
         if 'splash_screen' not in self.panels or remove:
+            self.base_panel.set_read_only(False)
             self.show_panel('splash_screen', "splash_screen", None, 2)
         self.panels['splash_screen'].update_text(msg)
 
@@ -903,11 +924,20 @@ class KlipperScreen(Gtk.Window):
         if self.reinit_count > self.max_retries or 'printer_select' in self._cur_panels:
             self.initializing = False
             return False
-        state = self.apiclient.get_server_info()
-        if state is False:
+        # Every query is pipelined over the websocket, each step waits only for the previous one
+        self._ws.send_methods(
+            (("server.info", None), ("machine.device_power.devices", None)),
+            self.init_printer_state
+        )
+        return False
+
+    @profiler.phase("init_printer_state")
+    def init_printer_state(self, results):
+        state, powerdevs = results
+        if not state or "result" not in state:
             logging.info("Moonraker not connected")
             self.initializing = False
-            return False
+            return
         self.connecting = not self._ws.connected
         self.connected_printer = self.connecting_to_printer
         self.base_panel.set_ks_printer_cfg(self.connected_printer)
@@ -915,8 +945,7 @@ class KlipperScreen(Gtk.Window):
         # Moonraker is ready, set a loop to init the printer
         self.reinit_count += 1
 
-        powerdevs = self.apiclient.send_request("machine/device_power/devices")
-        if powerdevs is not False:
+        if powerdevs and "result" in powerdevs:
             self.printer.configure_power_devices(powerdevs['result'])
 
         if state['result']['klippy_connected'] is False:
@@ -925,53 +954,78 @@ class KlipperScreen(Gtk.Window):
             msg += f"Klipper: {state['result']['klippy_state']}" + "\n\n"
             if self.reinit_count <= self.max_retries:
                 msg += _("Retrying") + f' #{self.reinit_count}'
-            return self._init_printer(msg)
-        printer_info = self.apiclient.get_printer_info()
-        if printer_info is False:
-            return self._init_printer("Unable to get printer info from moonraker")
-        config = self.apiclient.send_request("printer/objects/query?configfile")
-        if config is False:
-            return self._init_printer("Error getting printer configuration")
+            self._init_printer(msg)
+            return
+        self._ws.send_methods(
+            (
+                ("printer.info", None),
+                ("printer.objects.query", {"objects": {"configfile": None}}),
+                ("server.temperature_store", None),
+                ("server.config", None),
+            ),
+            self.init_printer_config,
+            powerdevs['result'] if powerdevs and "result" in powerdevs else None
+        )
+
+    @profiler.phase("init_printer_config")
+    def init_printer_config(self, results, power_devices):
+        printer_info, config, tempstore, server_config = results
+        if not printer_info or "result" not in printer_info:
+            self._init_printer("Unable to get printer info from moonraker")
+            return
+        if not config or "result" not in config:
+            self._init_printer("Error getting printer configuration")
+            return
+        self.printer_cache.save(self.connected_printer, printer_info['result'],
+                                config['result']['status']['configfile']['config'], power_devices)
         # Reinitialize printer, in case the printer was shut down and anything has changed.
         self.printer.reinit(printer_info['result'], config['result']['status'])
-
-        self.ws_subscribe()
-        extra_items = (self.printer.get_tools()
-                       + self.printer.get_heaters()
-                       + self.printer.get_fans()
-                       + self.printer.get_filament_sensors()
-                       + self.printer.get_output_pins()
-                       )
-
-        data = self.apiclient.send_request("printer/objects/query?" + "&".join(PRINTER_BASE_STATUS_OBJECTS +
-                                                                               extra_items))
-        if data is False:
-            return self._init_printer("Error getting printer object data with extra items")
-        self.printer.process_update(data['result']['status'])
-        self.init_tempstore()
-        GLib.timeout_add_seconds(2, self.init_tempstore)  # If devices changed it takes a while to register
-
+        self.preloader.clear()
+        self.update_tempstore([tempstore, server_config])
         self.files.initialize()
         self.files.refresh_files()
 
+        # The subscription response has the initial status of the subscribed fields. It's merged in the websocket
+        # thread before any notification, so the notifications that follow it are not overwritten by older values
+        if self.ws_subscribe(self.init_printer_status, handler=self.seed_printer_status) is False:
+            logging.info("Moonraker not connected")
+            self.initializing = False
+
+    def seed_printer_status(self, response):
+        if "result" in response:
+            self.printer.process_update(response['result']['status'])
+
+    @profiler.phase("init_printer_status")
+    def init_printer_status(self, response, method, params):
+        if "result" not in response:
+            self._init_printer("Error getting printer object data with extra items")
+            return
+        GLib.timeout_add_seconds(2, self.init_tempstore)  # If devices changed it takes a while to register
+
         logging.info("Printer initialized")
+        profiler.mark("Printer initialized")
+        # After the first panel is shown
+        GLib.idle_add(profiler.finish)
         self.initialized = True
         self.reinit_count = 0
         self.initializing = False
-        return False
 
     def init_tempstore(self):
-        self.printer.init_temp_store(self.apiclient.send_request("server/temperature_store"))
-        server_config = self.apiclient.send_request("server/config")
+        self._ws.send_methods((("server.temperature_store", None), ("server.config", None)), self.update_tempstore)
+        return False
+
+    def update_tempstore(self, results):
+        tempstore, server_config = results
         if server_config:
             try:
                 self.printer.tempstore_size = server_config["result"]["config"]["data_store"]["temperature_store_size"]
                 logging.info(f"Temperature store size: {self.printer.tempstore_size}")
             except KeyError:
                 logging.error("Couldn't get the temperature store size")
-        return False
+        self.printer.init_temp_store(tempstore)
 
     def base_panel_show_all(self):
+        self.base_panel.set_read_only(False)
         self.base_panel.show_macro_shortcut(self._config.get_main_config().getboolean('side_macro_shortcut', True))
         self.base_panel.show_heaters(True)
         self.base_panel.show_estop(True)
@@ -1068,6 +1122,10 @@ def main():
         "-l", "--logfile", default=os.path.join(logdir, "KlipperScreen.log"), metavar='<logfile>',
         help="Location of KlipperScreen logfile output"
     )
+    parser.add_argument(
+        "--profile-startup", action="store_true",
+        help="Save the duration of the startup phases as a Chrome trace next to the logfile"
+    )
     args = parser.parse_args()
 
     functions.setup_logging(
@@ -1077,17 +1135,26 @@ def main():
 
     functions.patch_threading_excepthook()
 
+    if args.profile_startup:
+        logfile = os.path.normpath(os.path.expanduser(args.logfile))
+        profiler.enable(os.path.join(os.path.dirname(logfile), "KlipperScreen-startup.json"))
+        # In case the printer is never initialized
+        GLib.timeout_add_seconds(300, profiler.finish)
+
     logging.info(f"KlipperScreen version: {version}")
     if not Gtk.init_check():
         logging.critical("Failed to initialize Gtk")
         raise RuntimeError
     try:
-        win = KlipperScreen(args, version)
+        with profiler.phase("KlipperScreen.__init__"):
+            win = KlipperScreen(args, version)
     except Exception as e:
         logging.exception("Failed to initialize window")
         raise RuntimeError from e
     win.connect("destroy", Gtk.main_quit)
-    win.show_all()
+    with profiler.phase("show_all"):
+        win.show_all()
+    profiler.mark("Main loop")
     Gtk.main()
 
 
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Compares the decode time of the available JSON codecs on recorded Moonraker payloads
+
+Record a payload with, for example:
+    curl -o objects.json "http://printer:7125/printer/objects/query?webhooks&print_stats&heater_bed"
+    curl -o files.json "http://printer:7125/server/files/list"
+Then run:
+    python3 scripts/json_benchmark.py objects.json files.json
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from ks_includes import json_codec  # noqa: E402
+
+
+def available_codecs():
+    codecs = {"json": json.loads}
+    for name in ("ujson", "orjson"):
+        try:
+            codecs[name] = importlib.import_module(name).loads
+        except ImportError:
+            print(f"{name} is not installed")
+    return codecs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON decode benchmark for Moonraker payloads")
+    parser.add_argument("payloads", nargs="+", help="files with recorded Moonraker responses")
+    parser.add_argument("-n", "--number", type=int, default=20, help="decodes per measurement")
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="measurements, the best one is reported")
+    args = parser.parse_args()
+
+    codecs = available_codecs()
+    print(f"KlipperScreen uses: {json_codec.NAME}\n")
+    for path in args.payloads:
+        with open(path, "rb") as f:
+            data = f.read()
+        print(f"{os.path.basename(path)} ({len(data) / 1024:.1f} KiB)")
+        baseline = None
+        for name, loads in codecs.items():
+            best = min(timeit.repeat(lambda: loads(data), number=args.number, repeat=args.repeat)) / args.number
+            baseline = baseline or best
+            print(f"  {name:<8}{best * 1000:9.3f} ms  {baseline / best:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()